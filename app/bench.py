@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+import argparse
+import csv
+import gzip
+import http.client
+import json
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from urllib.parse import urlencode
+
+BASE_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = BASE_DIR.parent
+SERVER_PATH = BASE_DIR / "server.py"
+DEFAULT_CSV = PROJECT_ROOT / "lib_updated.csv"
+SORT_KEYS = ["title", "author", "status", "genre", "language", "purchase_year", "created_at"]
+STATUSES = ["Not Started", "Reading", "Paused", "Finished", "DNF"]
+
+
+def to_int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def load_profile(csv_path):
+    counters = {key: Counter() for key in ["author", "genre", "language", "publisher", "purchase_location", "purchase_year"]}
+    subgenres = {}
+    pages = []
+    words = Counter()
+    read = Counter()
+    with open(csv_path, encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            title = (row.get("Name") or "").strip()
+            if not title:
+                continue
+            words.update(w for w in title.split() if len(w) > 2)
+            counters["author"][(row.get("Author") or "").strip() or None] += 1
+            genre = (row.get("Genre") or "").strip() or None
+            counters["genre"][genre] += 1
+            subgenres.setdefault(genre, Counter())[(row.get("Subgenre") or "").strip() or None] += 1
+            counters["language"][(row.get("Language") or "").strip() or None] += 1
+            counters["publisher"][(row.get("Publisher") or "").strip() or None] += 1
+            counters["purchase_location"][(row.get("Purchase Location") or "").strip() or None] += 1
+            counters["purchase_year"][to_int(row.get("Purchase Year"))] += 1
+            page_count = to_int(row.get("# of Pages"))
+            if page_count:
+                pages.append(page_count)
+            read[(row.get("Read") or "").strip().lower() == "true"] += 1
+    return {
+        "counters": counters,
+        "subgenres": subgenres,
+        "pages": pages or [300],
+        "words": [w for w, _ in words.most_common(2000)] or ["Book"],
+        "finished_ratio": read[True] / max(1, sum(read.values())),
+    }
+
+
+class Sampler:
+    def __init__(self, counter, rng):
+        self.values = list(counter.keys())
+        self.weights = list(counter.values())
+        self.rng = rng
+
+    def __call__(self):
+        return self.rng.choices(self.values, self.weights)[0]
+
+
+def iter_synthetic_books(profile, size, seed):
+    rng = random.Random(seed)
+    samplers = {key: Sampler(counter, rng) for key, counter in profile["counters"].items()}
+    subgenre_samplers = {genre: Sampler(counter, rng) for genre, counter in profile["subgenres"].items()}
+    known_authors = len(profile["counters"]["author"])
+    started = datetime(2020, 1, 1)
+    for i in range(size):
+        genre = samplers["genre"]()
+        # Past the real catalogue, grow a Zipf-like long tail of synthetic authors.
+        if rng.random() < min(0.9, 1 - known_authors / max(size, 1)):
+            author = f"Author {int(rng.paretovariate(1.1)) % max(size // 8, 1)}"
+        else:
+            author = samplers["author"]()
+        if rng.random() < profile["finished_ratio"]:
+            status = "Finished"
+        else:
+            status = rng.choice(["Not Started", "Not Started", "Not Started", "Reading", "Paused", "DNF"])
+        created = (started + timedelta(minutes=i)).isoformat(timespec="seconds")
+        yield {
+            "title": " ".join(rng.sample(profile["words"], k=min(len(profile["words"]), rng.randint(1, 4)))) + f" {i}",
+            "author": author,
+            "series_name": None,
+            "series_number": None,
+            "is_series": int(rng.random() < 0.3),
+            "pages": rng.choice(profile["pages"]) if rng.random() < 0.8 else None,
+            "language": samplers["language"](),
+            "genre": genre,
+            "subgenre": subgenre_samplers[genre]() if genre in subgenre_samplers else None,
+            "status": status,
+            "is_owned": int(rng.random() < 0.7),
+            "is_nonfiction": int(rng.random() < 0.15),
+            "purchase_year": samplers["purchase_year"](),
+            "purchase_location": samplers["purchase_location"](),
+            "publisher": samplers["publisher"](),
+            "format": None,
+            "source": None,
+            "rating": rng.randint(1, 5) if rng.random() < 0.3 else None,
+            "notes": None,
+            "date_added": None,
+            "date_started": None,
+            "date_finished": None,
+            "created_at": created,
+            "updated_at": created,
+        }
+
+
+def generate_library(db_path, size, seed, csv_path):
+    os.environ["BOOKS_DB"] = str(db_path)
+    sys.path.insert(0, str(BASE_DIR))
+    import server
+
+    profile = load_profile(csv_path)
+    server.init_db()
+    started = time.perf_counter()
+    with server.write_conn() as conn:
+        server.drop_derived_triggers(conn)
+        conn.execute("DELETE FROM books")
+        index_sql = server.drop_secondary_indexes(conn)
+        rows = iter_synthetic_books(profile, size, seed)
+        for batch in server.iter_batches(rows, 10000):
+            conn.executemany(server.INSERT_BOOK_SQL, batch)
+        for sql in index_sql:
+            conn.execute(sql)
+        server.rebuild_derived(conn)
+    server.POOL.reset()
+    return round(time.perf_counter() - started, 3)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(db_path, port, env_overrides):
+    env = dict(os.environ)
+    env.update({"BOOKS_DB": str(db_path), "HOST": "127.0.0.1", "PORT": str(port)})
+    env.update(env_overrides)
+    proc = subprocess.Popen(
+        [sys.executable, str(SERVER_PATH)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with code {proc.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("server did not start in time")
+
+
+def child_pids(pid):
+    children = []
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+        except OSError:
+            continue
+        if int(stat.rsplit(")", 1)[1].split()[1]) == pid:
+            children.append(int(entry.name))
+    return children
+
+
+def peak_rss_kb(pid):
+    total = None
+    for proc_pid in [pid, *child_pids(pid)]:
+        try:
+            with open(f"/proc/{proc_pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        total = (total or 0) + int(line.split()[1])
+        except OSError:
+            continue
+    return total
+
+
+def send(port, method, path, body=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    try:
+        payload = json.dumps(body).encode("utf-8") if body is not None else None
+        headers = {"Content-Type": "application/json", "Accept-Encoding": "gzip"} if payload else {"Accept-Encoding": "gzip"}
+        started = time.perf_counter()
+        conn.request(method, path, body=payload, headers=headers)
+        resp = conn.getresponse()
+        data = resp.read()
+        elapsed = time.perf_counter() - started
+        if resp.getheader("Content-Encoding") == "gzip":
+            data = gzip.decompress(data)
+        return resp.status, data, elapsed
+    finally:
+        conn.close()
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def run_scenario(port, make_request, requests, concurrency):
+    def one(i):
+        method, path, body = make_request(i)
+        try:
+            status, data, elapsed = send(port, method, path, body)
+            return status < 400, elapsed, data
+        except OSError:
+            return False, None, b""
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - started
+    latencies = sorted(o[1] * 1000 for o in outcomes if o[1] is not None)
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": sum(1 for o in outcomes if not o[0]),
+        "throughput_rps": round(requests / wall, 1) if wall else None,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 3) if latencies else None,
+            "p95": round(percentile(latencies, 95), 3) if latencies else None,
+            "p99": round(percentile(latencies, 99), 3) if latencies else None,
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else None,
+            "max": round(latencies[-1], 3) if latencies else None,
+        },
+    }, outcomes
+
+
+def build_scenarios(profile, size, seed):
+    rng = random.Random(seed)
+    genres = [g for g in profile["counters"]["genre"] if g]
+    languages = [v for v in profile["counters"]["language"] if v]
+    words = profile["words"][:200]
+    created_ids = []
+
+    def get(path, **params):
+        return ("GET", f"{path}?{urlencode(params)}" if params else path, None)
+
+    scenarios = {
+        "books_default": lambda i: get("/api/books", page=1, page_size=50),
+        "books_search": lambda i: get("/api/books", search=rng.choice(words), page_size=50),
+        "books_filter_status": lambda i: get("/api/books", status=rng.choice(STATUSES), page_size=50),
+        "books_filter_genre": lambda i: get("/api/books", genre=rng.choice(genres), sort="purchase_year", page_size=50),
+        "books_filter_language": lambda i: get("/api/books", language=rng.choice(languages), page_size=50),
+        "books_deep_page": lambda i: get("/api/books", page=max(1, size // 200 - rng.randint(0, 5)), page_size=200),
+        "books_cursor_first": lambda i: get("/api/books", cursor="", page_size=200),
+        "book_get": lambda i: get(f"/api/books/{rng.randint(1, size)}"),
+        "dashboard": lambda i: get("/api/dashboard"),
+        "filters": lambda i: get("/api/filters"),
+    }
+    for key in SORT_KEYS:
+        for order in ["asc", "desc"]:
+            scenarios[f"books_sort_{key}_{order}"] = (
+                lambda i, key=key, order=order: get("/api/books", sort=key, order=order, page=rng.randint(1, 20), page_size=50)
+            )
+
+    def create(i):
+        return ("POST", "/api/books", {"title": f"Bench {i}", "author": "Bench", "genre": rng.choice(genres)})
+
+    def update(i):
+        return ("PUT", f"/api/books/{rng.randint(1, size)}", {"title": f"Bench update {i}", "genre": rng.choice(genres)})
+
+    def delete(i):
+        book_id = created_ids.pop() if created_ids else rng.randint(1, size)
+        return ("DELETE", f"/api/books/{book_id}", None)
+
+    writes = {"write_create": create, "write_update": update, "write_delete": delete}
+    return scenarios, writes, created_ids
+
+
+def typed_json(body):
+    def typed(value):
+        if isinstance(value, tuple):
+            return ("object", [(key, typed(item)) for key, item in value[1]])
+        if isinstance(value, list):
+            return ("array", [typed(item) for item in value])
+        return (type(value).__name__, value)
+
+    return typed(json.loads(body, object_pairs_hook=lambda pairs: ("object", pairs)))
+
+
+def check_json_parity(db_path, scenarios, requests):
+    paths = [make_request(i)[1] for make_request in scenarios.values() for i in range(requests)]
+    bodies = {}
+    for fast in ["0", "1"]:
+        port = free_port()
+        proc = start_server(db_path, port, {"BOOKS_JSON_FAST": fast, "BOOKS_RESPONSE_CACHE_SIZE": "0"})
+        try:
+            bodies[fast] = [send(port, "GET", path) for path in paths]
+        finally:
+            proc.terminate()
+            proc.wait(timeout=10)
+    mismatches = []
+    for path, slow, fast in zip(paths, bodies["0"], bodies["1"]):
+        if slow[0] != fast[0] or typed_json(slow[1]) != typed_json(fast[1]):
+            mismatches.append(path)
+    return len(paths), mismatches
+
+
+def measure_startup(db_path, runs, env_overrides):
+    timings = []
+    for _ in range(runs):
+        port = free_port()
+        env = dict(os.environ)
+        env.update({"BOOKS_DB": str(db_path), "HOST": "127.0.0.1", "PORT": str(port)})
+        env.update(env_overrides)
+        started = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, str(SERVER_PATH)],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            deadline = time.time() + 60
+            while True:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"server exited with code {proc.returncode}")
+                if time.time() > deadline:
+                    raise RuntimeError("server did not start in time")
+                try:
+                    status, _, _ = send(port, "GET", "/api/books?page_size=1")
+                except OSError:
+                    time.sleep(0.005)
+                    continue
+                if status == 200:
+                    break
+            timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            proc.terminate()
+            proc.wait(timeout=10)
+    timings.sort()
+    return {
+        "runs": runs,
+        "first_response_ms": {
+            "min": round(timings[0], 2),
+            "p50": round(percentile(timings, 50), 2),
+            "max": round(timings[-1], 2),
+        },
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=PROJECT_ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    lines = []
+    for key, result in current["results"].items():
+        old = baseline.get("results", {}).get(key)
+        if not old:
+            continue
+        new_p95 = result["latency_ms"]["p95"]
+        old_p95 = old["latency_ms"]["p95"]
+        if new_p95 is None or not old_p95:
+            continue
+        change = (new_p95 - old_p95) / old_p95 * 100
+        lines.append(f"{key:48s} p95 {old_p95:9.2f} -> {new_p95:9.2f} ms ({change:+.1f}%)")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the local library server.")
+    parser.add_argument("--size", type=int, default=10000, help="number of synthetic books (default 10000)")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario per concurrency level")
+    parser.add_argument("--scenarios", default="", help="comma-separated scenario names (default: all)")
+    parser.add_argument("--skip-writes", action="store_true", help="only run read scenarios")
+    parser.add_argument("--no-cache", action="store_true", help="disable the server response cache")
+    parser.add_argument("--server", choices=["threading", "asyncio"], default="threading", help="server mode to benchmark")
+    parser.add_argument("--workers", type=int, default=1, help="server worker processes")
+    parser.add_argument(
+        "--storage", choices=["wide", "normalized"], default="wide", help="books storage layout (converted on start)"
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--csv", default=str(DEFAULT_CSV), help="CSV used to derive value distributions")
+    parser.add_argument("--db", help="reuse or create the synthetic DB at this path")
+    parser.add_argument("--output", default="bench_results.json", help="where to write the JSON report")
+    parser.add_argument("--compare", help="previous JSON report to compare p95 latencies against")
+    parser.add_argument(
+        "--check-json",
+        action="store_true",
+        help="compare read responses with the SQL JSON fast path on and off instead of benchmarking",
+    )
+    parser.add_argument(
+        "--startup",
+        action="store_true",
+        help="measure time from process start to the first successful response instead of benchmarking",
+    )
+    parser.add_argument("--runs", type=int, default=10, help="server starts to time with --startup")
+    args = parser.parse_args()
+
+    levels = [int(v) for v in args.concurrency.split(",") if v.strip()]
+    db_path = Path(args.db) if args.db else Path(tempfile.mkdtemp(prefix="books-bench-")) / "books.db"
+    generated_in = None
+    if not db_path.exists():
+        print(f"Generating {args.size} books into {db_path} ...")
+        generated_in = generate_library(db_path, args.size, args.seed, args.csv)
+        print(f"Generated in {generated_in}s")
+
+    with sqlite3.connect(db_path) as conn:
+        size = conn.execute("SELECT COUNT(*) FROM books").fetchone()[0]
+    profile = load_profile(args.csv)
+    scenarios, writes, created_ids = build_scenarios(profile, size, args.seed)
+    if not args.skip_writes:
+        scenarios.update(writes)
+    if args.scenarios:
+        wanted = {name.strip() for name in args.scenarios.split(",")}
+        scenarios = {name: fn for name, fn in scenarios.items() if name in wanted}
+
+    if args.check_json:
+        reads = {name: fn for name, fn in scenarios.items() if name not in writes}
+        checked, mismatches = check_json_parity(db_path, reads, args.requests)
+        for path in mismatches:
+            print(f"MISMATCH {path}")
+        print(f"Checked {checked} responses, {len(mismatches)} mismatches")
+        sys.exit(1 if mismatches else 0)
+
+    env_overrides = {"BOOKS_SERVER": args.server, "BOOKS_WORKERS": str(args.workers), "BOOKS_STORAGE": args.storage}
+    if args.no_cache:
+        env_overrides["BOOKS_RESPONSE_CACHE_SIZE"] = "0"
+    if args.startup:
+        result = measure_startup(db_path, args.runs, env_overrides)
+        lat = result["first_response_ms"]
+        print(f"startup x{args.runs}: min {lat['min']:.2f}  p50 {lat['p50']:.2f}  max {lat['max']:.2f} ms")
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "commit": git_commit(),
+                    "size": size,
+                    "config": {"server": args.server, "workers": args.workers},
+                    "startup": result,
+                },
+                f,
+                indent=2,
+            )
+        print(f"Wrote {args.output}")
+        return
+
+    port = free_port()
+    proc = start_server(db_path, port, env_overrides)
+    results = {}
+    try:
+        for level in levels:
+            for name, make_request in scenarios.items():
+                result, outcomes = run_scenario(port, make_request, args.requests, level)
+                if name == "write_create":
+                    for ok, _, data in outcomes:
+                        if ok:
+                            created_ids.append(json.loads(data)["id"])
+                key = f"{name}@c{level}"
+                results[key] = result
+                lat = result["latency_ms"]
+                print(
+                    f"{key:48s} p50 {lat['p50']:8.2f}  p95 {lat['p95']:8.2f}  p99 {lat['p99']:8.2f} ms"
+                    f"  {result['throughput_rps']:8.1f} req/s  errors {result['errors']}"
+                )
+        rss = peak_rss_kb(proc.pid)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "sqlite": sqlite3.sqlite_version,
+        "size": size,
+        "db_bytes": db_path.stat().st_size,
+        "generated_in_seconds": generated_in,
+        "config": {
+            "concurrency": levels,
+            "requests": args.requests,
+            "no_cache": args.no_cache,
+            "server": args.server,
+            "workers": args.workers,
+            "storage": args.storage,
+            "seed": args.seed,
+        },
+        "server_peak_rss_kb": rss,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Peak server RSS: {rss} kB")
+    print(f"Wrote {args.output}")
+    if args.compare:
+        for line in compare_results(report, args.compare):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,66 @@
 #!/usr/bin/env python3
-import csv
+import base64
+import binascii
+import bisect
+import gzip
+import hashlib
+import heapq
+import importlib.util
+import io
+import itertools
 import json
+import math
 import os
+import queue
+import re
+import shutil
+import signal
+import socket
 import sqlite3
-from datetime import datetime
+import sys
+import threading
+import time
+import unicodedata
+import uuid
+import zlib
+from collections import Counter, OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
 from http import HTTPStatus
 from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from operator import itemgetter
 from pathlib import Path
-from urllib.parse import parse_qs, urlparse
+from urllib.parse import parse_qs, parse_qsl, urlencode, urlparse
+
+
+def lazy_import(name):
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        return None
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+asyncio = lazy_import("asyncio")
+np = lazy_import("numpy")
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 BASE_DIR = Path(__file__).resolve().parent
 DATA_DIR = BASE_DIR / "data"
@@ -15,11 +68,932 @@ STATIC_DIR = BASE_DIR / "static"
 DB_PATH = Path(os.getenv("BOOKS_DB", DATA_DIR / "books.db"))
 PROJECT_ROOT = BASE_DIR.parent
 
+DB_POOL_SIZE = max(1, int(os.getenv("BOOKS_DB_POOL_SIZE", "4")))
+DB_POOL_TIMEOUT = float(os.getenv("BOOKS_DB_POOL_TIMEOUT", "10"))
+DB_BUSY_TIMEOUT = int(os.getenv("BOOKS_DB_BUSY_TIMEOUT", "5000"))
+DB_SYNCHRONOUS = os.getenv("BOOKS_DB_SYNCHRONOUS", "NORMAL").upper()
+DB_CACHE_SIZE = int(os.getenv("BOOKS_DB_CACHE_SIZE", "-16000"))
+DB_MMAP_SIZE = int(os.getenv("BOOKS_DB_MMAP_SIZE", str(64 * 1024 * 1024)))
+IMPORT_BATCH_SIZE = max(1, int(os.getenv("BOOKS_IMPORT_BATCH_SIZE", "1000")))
+IMPORT_INDEX_REBUILD_BYTES = int(os.getenv("BOOKS_IMPORT_INDEX_REBUILD_BYTES", str(8 * 1024 * 1024)))
+IMPORT_MODES = {"replace", "append", "upsert"}
+EXPORT_FETCH_SIZE = 500
+EXPORT_CHUNK_BYTES = 64 * 1024
+CHANGE_LOG_KEEP = max(100, int(os.getenv("BOOKS_CHANGE_LOG_KEEP", "10000")))
+SSE_POLL_INTERVAL = float(os.getenv("BOOKS_SSE_POLL", "0.5"))
+SSE_MAX_CLIENTS = max(1, int(os.getenv("BOOKS_SSE_MAX_CLIENTS", "32")))
+SSE_HEARTBEAT = 15.0
+SSE_BATCH = 500
+ANALYTICS_ENGINE = os.getenv("BOOKS_ANALYTICS_ENGINE", "auto").lower()
+STORAGE_MODE = os.getenv("BOOKS_STORAGE", "wide").lower()
+BATCH_MAX_OPS = max(1, int(os.getenv("BOOKS_BATCH_MAX_OPS", "5000")))
+SIMILAR_K = max(1, int(os.getenv("BOOKS_SIMILAR_K", "10")))
+SIMILAR_CANDIDATES = max(8, int(os.getenv("BOOKS_SIMILAR_CANDIDATES", "64")))
+SIMILAR_DB = DB_PATH.with_name(f"{DB_PATH.stem}-similar.db")
+SIMILAR_REFRESH_INTERVAL = max(0.05, float(os.getenv("BOOKS_SIMILAR_REFRESH_INTERVAL", "1")))
+SNAPSHOT_DIR = Path(os.getenv("BOOKS_SNAPSHOT_DIR", DB_PATH.parent / "snapshots"))
+SNAPSHOT_KEEP = max(1, int(os.getenv("BOOKS_SNAPSHOT_KEEP", "10")))
+SNAPSHOT_AUTO = os.getenv("BOOKS_SNAPSHOT_AUTO", "1") != "0"
+SNAPSHOT_BATCH_MIN = max(1, int(os.getenv("BOOKS_SNAPSHOT_BATCH_MIN", "100")))
+SNAPSHOT_STEP_PAGES = max(1, int(os.getenv("BOOKS_SNAPSHOT_STEP_PAGES", "1024")))
+SNAPSHOT_STEP_SLEEP = float(os.getenv("BOOKS_SNAPSHOT_STEP_SLEEP", "0.005"))
+SNAPSHOT_MAX_RESTARTS = 3
+SNAPSHOT_GZIP_LEVEL = 6
+WRITE_BATCH_WINDOW_MS = max(0.0, float(os.getenv("BOOKS_WRITE_BATCH_MS", "2")))
+WRITE_BATCH_MAX = max(1, int(os.getenv("BOOKS_WRITE_BATCH_MAX", "64")))
+WRITE_QUEUE_DEPTH = max(1, int(os.getenv("BOOKS_WRITE_QUEUE_DEPTH", "256")))
+WRITE_QUEUE_TIMEOUT = float(os.getenv("BOOKS_WRITE_QUEUE_TIMEOUT", "5"))
+WRITE_BATCH_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128]
+JSON_FAST_PATH = os.getenv("BOOKS_JSON_FAST", "1") != "0"
+SERVER_MODE = os.getenv("BOOKS_SERVER", "threading").lower()
+ASYNC_MAX_CONCURRENCY = max(1, int(os.getenv("BOOKS_ASYNC_MAX_CONCURRENCY", "64")))
+ASYNC_DB_THREADS = max(1, int(os.getenv("BOOKS_ASYNC_DB_THREADS", str(DB_POOL_SIZE))))
+ASYNC_KEEPALIVE_TIMEOUT = float(os.getenv("BOOKS_ASYNC_KEEPALIVE_TIMEOUT", "15"))
+ASYNC_MAX_HEADER_BYTES = 64 * 1024
+SHUTDOWN_TIMEOUT = float(os.getenv("BOOKS_SHUTDOWN_TIMEOUT", "10"))
+WORKERS = max(1, int(os.getenv("BOOKS_WORKERS", "1")))
+WORKER_RESTART_DELAY = 1.0
+PROFILE_ENABLED = os.getenv("BOOKS_PROFILE", "0").lower() in {"1", "true", "yes"}
+SLOW_QUERY_MS = float(os.getenv("BOOKS_SLOW_QUERY_MS", "50"))
+SLOW_QUERY_LOG = Path(os.getenv("BOOKS_SLOW_QUERY_LOG", DATA_DIR / "slow-queries.log"))
+RESPONSE_CACHE_SIZE = max(0, int(os.getenv("BOOKS_RESPONSE_CACHE_SIZE", "256")))
+ROW_CACHE_BYTES = max(0, int(os.getenv("BOOKS_ROW_CACHE_BYTES", str(4 * 1024 * 1024))))
+COMPRESS_MIN_BYTES = int(os.getenv("BOOKS_COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = min(9, max(1, int(os.getenv("BOOKS_GZIP_LEVEL", "6"))))
+STATIC_MAX_AGE = int(os.getenv("BOOKS_STATIC_MAX_AGE", "3600"))
+STATIC_CACHE_DIR = Path(os.getenv("BOOKS_STATIC_CACHE", DATA_DIR / "static-cache"))
+STATIC_COMPRESS_SUFFIXES = {".html", ".js", ".css", ".svg", ".json", ".txt"}
+
+if DB_SYNCHRONOUS not in {"OFF", "NORMAL", "FULL", "EXTRA"}:
+    DB_SYNCHRONOUS = "NORMAL"
+
+
+LATENCY_BUCKETS_MS = [1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+_profile_local = threading.local()
+
+
+def _active_profile():
+    return getattr(_profile_local, "profile", None)
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    _record = None
+
+    def _track(self, sql, params, started):
+        profile = _active_profile()
+        if profile is None:
+            self._record = None
+            return
+        self._record = {"sql": sql, "params": params, "ms": (time.perf_counter() - started) * 1000, "rows": 0}
+        profile["queries"].append(self._record)
+
+    def _fetched(self, rows, started):
+        if self._record is not None:
+            self._record["ms"] += (time.perf_counter() - started) * 1000
+            self._record["rows"] += rows
+
+    def execute(self, sql, params=()):
+        started = time.perf_counter()
+        super().execute(sql, params)
+        self._track(sql, params, started)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        started = time.perf_counter()
+        super().executemany(sql, seq_of_params)
+        self._track(sql, "<many>", started)
+        if self._record is not None:
+            self._record["rows"] = self.rowcount
+        return self
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(0 if row is None else 1, started)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(len(rows), started)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(len(rows), started)
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        row = super().__next__()
+        self._fetched(1, started)
+        return row
+
+
+class ProfiledConnection(sqlite3.Connection):
+    def execute(self, sql, params=()):
+        return self.cursor(ProfiledCursor).execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor(ProfiledCursor).executemany(sql, seq_of_params)
+
+
+CONNECTION_FACTORY = ProfiledConnection if PROFILE_ENABLED else sqlite3.Connection
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routes = {}
+        self.queries = {}
+        self.slow_queries = []
+
+    def observe_request(self, route, status, total_ms, profile):
+        sql_ms = sum(q["ms"] for q in profile["queries"])
+        with self._lock:
+            stats = self.routes.get(route)
+            if stats is None:
+                stats = self.routes[route] = {
+                    "count": 0,
+                    "sum_ms": 0.0,
+                    "max_ms": 0.0,
+                    "buckets": [0] * len(LATENCY_BUCKETS_MS),
+                    "status": {},
+                    "sql_ms": 0.0,
+                    "sql_queries": 0,
+                    "serialize_ms": 0.0,
+                    "write_ms": 0.0,
+                }
+            stats["count"] += 1
+            stats["sum_ms"] += total_ms
+            stats["max_ms"] = max(stats["max_ms"], total_ms)
+            for i, bound in enumerate(LATENCY_BUCKETS_MS):
+                if total_ms <= bound:
+                    stats["buckets"][i] += 1
+            key = str(status)
+            stats["status"][key] = stats["status"].get(key, 0) + 1
+            stats["sql_ms"] += sql_ms
+            stats["sql_queries"] += len(profile["queries"])
+            stats["serialize_ms"] += profile["serialize_ms"]
+            stats["write_ms"] += profile["write_ms"]
+            for q in profile["queries"]:
+                sql = " ".join(q["sql"].split())[:300]
+                agg = self.queries.get(sql)
+                if agg is None:
+                    agg = self.queries[sql] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0}
+                agg["count"] += 1
+                agg["total_ms"] += q["ms"]
+                agg["max_ms"] = max(agg["max_ms"], q["ms"])
+                agg["rows"] += max(q["rows"], 0)
+
+    def record_slow(self, entry):
+        with self._lock:
+            self.slow_queries.append(entry)
+            del self.slow_queries[:-50]
+
+    def snapshot(self):
+        with self._lock:
+            routes = {}
+            for route, stats in self.routes.items():
+                routes[route] = {
+                    **{k: round(v, 3) if isinstance(v, float) else v for k, v in stats.items() if k != "buckets"},
+                    "avg_ms": round(stats["sum_ms"] / stats["count"], 3) if stats["count"] else 0,
+                    "histogram_ms": dict(zip([str(b) for b in LATENCY_BUCKETS_MS], stats["buckets"])),
+                }
+            queries = sorted(
+                ({"sql": sql, **{k: round(v, 3) if isinstance(v, float) else v for k, v in agg.items()}}
+                 for sql, agg in self.queries.items()),
+                key=lambda q: q["total_ms"],
+                reverse=True,
+            )[:50]
+            return {"routes": routes, "top_queries": queries, "slow_queries": list(self.slow_queries)}
+
+    def prometheus(self):
+        lines = [
+            "# HELP books_http_request_duration_seconds Request latency by route.",
+            "# TYPE books_http_request_duration_seconds histogram",
+        ]
+        with self._lock:
+            routes = {route: dict(stats, buckets=list(stats["buckets"])) for route, stats in self.routes.items()}
+        labels = {route: _prometheus_labels(route) for route in routes}
+        for route, stats in sorted(routes.items()):
+            label = labels[route]
+            for bound, count in zip(LATENCY_BUCKETS_MS, stats["buckets"]):
+                lines.append(f'books_http_request_duration_seconds_bucket{{{label},le="{bound / 1000}"}} {count}')
+            lines.append(f'books_http_request_duration_seconds_bucket{{{label},le="+Inf"}} {stats["count"]}')
+            lines.append(f'books_http_request_duration_seconds_sum{{{label}}} {stats["sum_ms"] / 1000}')
+            lines.append(f'books_http_request_duration_seconds_count{{{label}}} {stats["count"]}')
+        for name, key, help_text in [
+            ("books_sql_seconds_total", "sql_ms", "Time spent in SQLite by route."),
+            ("books_serialize_seconds_total", "serialize_ms", "Time spent encoding JSON by route."),
+            ("books_socket_write_seconds_total", "write_ms", "Time spent writing responses by route."),
+        ]:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for route, stats in sorted(routes.items()):
+                lines.append(f'{name}{{{labels[route]}}} {stats[key] / 1000}')
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+
+def _prometheus_labels(route):
+    method, _, path = route.partition(" ")
+    path = path.replace("\\", "\\\\").replace('"', '\\"')
+    return f'method="{method}",route="{path}"'
+
+
+def route_label(path):
+    path = urlparse(path).path
+    if not path.startswith("/api/"):
+        return "static"
+    parts = path.rstrip("/").split("/")
+    if len(parts) >= 4 and parts[2] == "books" and parts[3].isdigit():
+        parts[3] = "{id}"
+    elif len(parts) >= 4 and parts[2] == "import":
+        parts[3] = "{job_id}"
+    elif len(parts) >= 4 and parts[2] == "snapshots":
+        parts[3] = "{id}"
+    return "/".join(parts)
+
+
+def start_request_profile():
+    _profile_local.profile = {"queries": [], "serialize_ms": 0.0, "write_ms": 0.0}
+    return _profile_local.profile
+
+
+def finish_request_profile(route, status, total_ms):
+    profile = _active_profile()
+    _profile_local.profile = None
+    if profile is None:
+        return
+    METRICS.observe_request(route, status, total_ms, profile)
+    for q in profile["queries"]:
+        if q["ms"] >= SLOW_QUERY_MS:
+            log_slow_query(route, q)
+
+
+def log_slow_query(route, query):
+    plan = None
+    if query["sql"].lstrip().split(None, 1)[0].upper() in {"SELECT", "WITH", "UPDATE", "DELETE", "INSERT"}:
+        try:
+            with read_conn() as conn:
+                params = query["params"] if query["params"] != "<many>" else ()
+                plan = [r["detail"] for r in conn.execute(f"EXPLAIN QUERY PLAN {query['sql']}", params)]
+        except (sqlite3.Error, PoolTimeout):
+            plan = None
+    entry = {
+        "ts": datetime.utcnow().isoformat(timespec="milliseconds"),
+        "route": route,
+        "ms": round(query["ms"], 3),
+        "rows": query["rows"],
+        "sql": " ".join(query["sql"].split()),
+        "params": repr(query["params"])[:500],
+        "plan": plan,
+    }
+    METRICS.record_slow(entry)
+    try:
+        SLOW_QUERY_LOG.parent.mkdir(parents=True, exist_ok=True)
+        with SLOW_QUERY_LOG.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    except OSError:
+        pass
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, path, size):
+        self.path = Path(path)
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._writer = None
+        self._epoch = 0
+        self._readers_open = 0
+        self._stats = {
+            "reader_acquires": 0,
+            "reader_waits": 0,
+            "reader_timeouts": 0,
+            "readers_created": 0,
+            "writer_acquires": 0,
+            "writer_wait_seconds": 0.0,
+            "writer_created": 0,
+        }
+
+    def _configure(self, conn):
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT}")
+        conn.execute(f"PRAGMA cache_size = {DB_CACHE_SIZE}")
+        conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+        return conn
+
+    def _connect_reader(self):
+        uri = f"{self.path.resolve().as_uri()}?mode=ro"
+        conn = sqlite3.connect(
+            uri, uri=True, isolation_level=None, check_same_thread=False, factory=CONNECTION_FACTORY
+        )
+        self._configure(conn)
+        conn.execute("PRAGMA query_only = ON")
+        conn.execute("ATTACH DATABASE ? AS similar", (f"{SIMILAR_DB.resolve().as_uri()}?mode=ro",))
+        return conn
+
+    def _connect_writer(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, factory=CONNECTION_FACTORY)
+        self._configure(conn)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute(f"PRAGMA synchronous = {DB_SYNCHRONOUS}")
+        return conn
+
+    def _acquire_reader(self):
+        with self._lock:
+            self._stats["reader_acquires"] += 1
+            epoch = self._epoch
+        try:
+            return self._idle.get_nowait(), epoch
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_open = self._readers_open < self.size
+            if can_open:
+                self._readers_open += 1
+                self._stats["readers_created"] += 1
+            else:
+                self._stats["reader_waits"] += 1
+        if can_open:
+            try:
+                return self._connect_reader(), epoch
+            except Exception:
+                with self._lock:
+                    self._readers_open -= 1
+                raise
+        try:
+            return self._idle.get(timeout=DB_POOL_TIMEOUT), epoch
+        except queue.Empty:
+            with self._lock:
+                self._stats["reader_timeouts"] += 1
+            raise PoolTimeout("Timed out waiting for a database connection")
+
+    def _release_reader(self, conn, epoch):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            stale = epoch != self._epoch
+            if stale:
+                self._readers_open -= 1
+        if stale:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    @contextmanager
+    def reader(self):
+        conn, epoch = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            self._release_reader(conn, epoch)
+
+    @contextmanager
+    def exclusive(self):
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._connect_writer()
+                self._stats["writer_created"] += 1
+            yield self._writer
+
+    @contextmanager
+    def writer(self):
+        started = time.perf_counter()
+        with self.exclusive() as conn:
+            with self._lock:
+                self._stats["writer_acquires"] += 1
+                self._stats["writer_wait_seconds"] += time.perf_counter() - started
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            else:
+                if conn.in_transaction:
+                    conn.execute("COMMIT")
+
+    def reset(self):
+        with self._lock:
+            self._epoch += 1
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
+                self._readers_open -= 1
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data["writer_wait_seconds"] = round(data["writer_wait_seconds"], 6)
+            data["size"] = self.size
+            data["readers_open"] = self._readers_open
+            data["readers_idle"] = self._idle.qsize()
+            data["readers_in_use"] = self._readers_open - self._idle.qsize()
+        data["pragmas"] = {
+            "journal_mode": "wal",
+            "synchronous": DB_SYNCHRONOUS,
+            "cache_size": DB_CACHE_SIZE,
+            "mmap_size": DB_MMAP_SIZE,
+            "busy_timeout": DB_BUSY_TIMEOUT,
+        }
+        return data
+
+
+POOL = ConnectionPool(DB_PATH, DB_POOL_SIZE)
+
+_generation = 0
+_generation_lock = threading.Lock()
+_data_version_conn = None
+_data_version = None
+
+
+def _poll_data_version():
+    global _data_version_conn, _data_version
+    if _data_version_conn is None:
+        uri = f"{DB_PATH.resolve().as_uri()}?mode=ro"
+        _data_version_conn = sqlite3.connect(uri, uri=True, isolation_level=None, check_same_thread=False)
+    version = _data_version_conn.execute("PRAGMA data_version").fetchone()[0]
+    changed = version != _data_version
+    _data_version = version
+    return changed
+
+
+def reset_data_version():
+    global _data_version_conn, _data_version
+    with _generation_lock:
+        if _data_version_conn is not None:
+            _data_version_conn.close()
+        _data_version_conn = None
+        _data_version = None
+
+
+def current_generation():
+    global _generation
+    with _generation_lock:
+        if _poll_data_version():
+            _generation += 1
+        return _generation
+
+
+def bump_generation():
+    global _generation
+    with _generation_lock:
+        _poll_data_version()
+        _generation += 1
+        return _generation
+
+
+def read_conn():
+    return POOL.reader()
+
+
+@contextmanager
+def write_conn():
+    with POOL.writer() as conn:
+        before = conn.total_changes
+        yield conn
+        changed = conn.total_changes != before
+    if changed:
+        bump_generation()
+        SIMILAR.wake()
+
+
+class WriteQueueFull(PoolTimeout):
+    pass
+
+
+class WriteQueue:
+    def __init__(self, depth, window_ms, max_batch):
+        self.depth = depth
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue = queue.Queue(maxsize=depth)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stats = {
+            "rejected": 0,
+            "failed": 0,
+            "batches": 0,
+            "ops": 0,
+            "max_batch": 0,
+            "wait_ms_sum": 0.0,
+            "wait_ms_max": 0.0,
+            "commit_ms_sum": 0.0,
+            "batch_sizes": [0] * len(WRITE_BATCH_BUCKETS),
+            "wait_buckets": [0] * len(LATENCY_BUCKETS_MS),
+        }
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="books-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, fn):
+        self._ensure_thread()
+        job = {
+            "fn": fn,
+            "profile": _active_profile(),
+            "queued": time.perf_counter(),
+            "done": threading.Event(),
+            "result": None,
+            "error": None,
+        }
+        try:
+            self._queue.put(job, timeout=WRITE_QUEUE_TIMEOUT)
+        except queue.Full:
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise WriteQueueFull("Too many pending writes, try again")
+        job["done"].wait()
+        if job["error"] is not None:
+            raise job["error"]
+        return job["result"]
+
+    def _run(self):
+        while True:
+            jobs = [self._queue.get()]
+            deadline = time.perf_counter() + self.window
+            while len(jobs) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                try:
+                    jobs.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._apply(jobs)
+
+    def _apply(self, jobs):
+        started = time.perf_counter()
+        try:
+            with write_conn() as conn:
+                for job in jobs:
+                    conn.execute("SAVEPOINT write_job")
+                    _profile_local.profile = job["profile"]
+                    try:
+                        job["result"] = job["fn"](conn)
+                    except Exception as exc:
+                        conn.execute("ROLLBACK TO write_job")
+                        job["error"] = exc
+                    finally:
+                        _profile_local.profile = None
+                    conn.execute("RELEASE write_job")
+        except Exception as exc:
+            for job in jobs:
+                job["error"] = exc
+        self._record(jobs, started, time.perf_counter())
+        for job in jobs:
+            job["done"].set()
+
+    def _record(self, jobs, started, finished):
+        with self._lock:
+            stats = self._stats
+            stats["failed"] += sum(1 for job in jobs if job["error"] is not None)
+            stats["batches"] += 1
+            stats["ops"] += len(jobs)
+            stats["max_batch"] = max(stats["max_batch"], len(jobs))
+            stats["commit_ms_sum"] += (finished - started) * 1000
+            for i, bound in enumerate(WRITE_BATCH_BUCKETS):
+                if len(jobs) <= bound:
+                    stats["batch_sizes"][i] += 1
+            for job in jobs:
+                wait_ms = (started - job["queued"]) * 1000
+                stats["wait_ms_sum"] += wait_ms
+                stats["wait_ms_max"] = max(stats["wait_ms_max"], wait_ms)
+                for i, bound in enumerate(LATENCY_BUCKETS_MS):
+                    if wait_ms <= bound:
+                        stats["wait_buckets"][i] += 1
+
+    def stats(self):
+        with self._lock:
+            data = {k: round(v, 3) if isinstance(v, float) else v for k, v in self._stats.items()}
+            data["batch_sizes"] = dict(zip([str(b) for b in WRITE_BATCH_BUCKETS], self._stats["batch_sizes"]))
+            data["wait_histogram_ms"] = dict(zip([str(b) for b in LATENCY_BUCKETS_MS], data.pop("wait_buckets")))
+        batches, ops = data["batches"], data["ops"]
+        data["avg_batch"] = round(ops / batches, 3) if batches else 0
+        data["avg_wait_ms"] = round(data["wait_ms_sum"] / ops, 3) if ops else 0
+        data["avg_commit_ms"] = round(data["commit_ms_sum"] / batches, 3) if batches else 0
+        data["pending"] = self._queue.qsize()
+        data["depth"] = self.depth
+        data["window_ms"] = self.window * 1000
+        data["max_batch_size"] = self.max_batch
+        return data
+
+    def prometheus(self):
+        with self._lock:
+            stats = dict(self._stats, batch_sizes=list(self._stats["batch_sizes"]))
+        lines = [
+            "# HELP books_write_batch_size Mutations committed per write transaction.",
+            "# TYPE books_write_batch_size histogram",
+        ]
+        for bound, count in zip(WRITE_BATCH_BUCKETS, stats["batch_sizes"]):
+            lines.append(f'books_write_batch_size_bucket{{le="{bound}"}} {count}')
+        lines.append(f'books_write_batch_size_bucket{{le="+Inf"}} {stats["batches"]}')
+        lines.append(f"books_write_batch_size_sum {stats['ops']}")
+        lines.append(f"books_write_batch_size_count {stats['batches']}")
+        lines.append("# HELP books_write_queue_wait_seconds Time a mutation waited for its transaction.")
+        lines.append("# TYPE books_write_queue_wait_seconds histogram")
+        for bound, count in zip(LATENCY_BUCKETS_MS, stats["wait_buckets"]):
+            lines.append(f'books_write_queue_wait_seconds_bucket{{le="{bound / 1000}"}} {count}')
+        lines.append(f'books_write_queue_wait_seconds_bucket{{le="+Inf"}} {stats["ops"]}')
+        lines.append(f"books_write_queue_wait_seconds_sum {stats['wait_ms_sum'] / 1000}")
+        lines.append(f"books_write_queue_wait_seconds_count {stats['ops']}")
+        lines.append("# HELP books_write_queue_rejected_total Mutations rejected because the write queue was full.")
+        lines.append("# TYPE books_write_queue_rejected_total counter")
+        lines.append(f"books_write_queue_rejected_total {stats['rejected']}")
+        lines.append("# HELP books_write_queue_pending Mutations waiting for the writer thread.")
+        lines.append("# TYPE books_write_queue_pending gauge")
+        lines.append(f"books_write_queue_pending {self._queue.qsize()}")
+        return "\n".join(lines) + "\n"
+
+
+WRITE_QUEUE = WriteQueue(WRITE_QUEUE_DEPTH, WRITE_BATCH_WINDOW_MS, WRITE_BATCH_MAX)
+
+
+class ResponseCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "stores": 0, "not_modified": 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry
+
+    def put(self, key, entry):
+        if not self.max_entries:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous["body"])
+            self._entries[key] = entry
+            self._bytes += len(entry["body"])
+            self._stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted["body"])
+                self._stats["evictions"] += 1
+
+    def note_not_modified(self):
+        with self._lock:
+            self._stats["not_modified"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data["entries"] = len(self._entries)
+            data["max_entries"] = self.max_entries
+            data["bytes"] = self._bytes
+        data["generation"] = current_generation()
+        return data
+
+
+RESPONSE_CACHE = ResponseCache(RESPONSE_CACHE_SIZE)
+
+
+class CachedRow:
+    __slots__ = ("seq", "body")
+
+    def __init__(self, seq, body):
+        self.seq = seq
+        self.body = body
+
+
+class RowCache:
+    ENTRY_OVERHEAD = 160
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.seq = None
+        self.generation = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidations": 0, "syncs": 0}
+
+    def _sync(self, generation):
+        with read_conn() as conn:
+            conn.execute("BEGIN")
+            try:
+                oldest, latest = conn.execute("SELECT MIN(seq), MAX(seq) FROM book_changes").fetchone()
+                since = self.seq
+                changes = []
+                if since is not None and latest is not None and latest > since:
+                    changes = conn.execute(
+                        "SELECT seq, book_id, op FROM book_changes WHERE seq > ? ORDER BY seq", (since,)
+                    ).fetchall()
+            finally:
+                conn.execute("COMMIT")
+        latest = latest or 0
+        with self._lock:
+            self._stats["syncs"] += 1
+            if self.seq is not None and self.seq != since:
+                return
+            if (
+                since is None
+                or latest < since
+                or (oldest or 0) > since + 1
+                or any(op == "reset" for _, _, op in changes)
+            ):
+                self._stats["invalidations"] += len(self._entries)
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                for seq, book_id, _ in changes:
+                    entry = self._entries.get(book_id)
+                    if entry is not None and entry.seq < seq:
+                        self._drop(book_id)
+            self.seq = latest
+            self.generation = generation
+
+    def _drop(self, book_id):
+        entry = self._entries.pop(book_id, None)
+        if entry is not None:
+            self._bytes -= len(entry.body) + self.ENTRY_OVERHEAD
+            self._stats["invalidations"] += 1
+
+    def get(self, book_id):
+        if not self.max_bytes:
+            return None
+        generation = current_generation()
+        if generation != self.generation:
+            self._sync(generation)
+        with self._lock:
+            entry = self._entries.get(book_id)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(book_id)
+            self._stats["hits"] += 1
+            return entry.body
+
+    def store(self, book_id, seq, row):
+        body = dumps_json(row_to_dict(row))
+        size = len(body) + self.ENTRY_OVERHEAD
+        if seq is None or size > self.max_bytes:
+            return body
+        with self._lock:
+            current = self._entries.get(book_id)
+            if (self.seq is not None and seq < self.seq) or (current is not None and current.seq > seq):
+                return body
+            self._drop(book_id)
+            self._entries[book_id] = CachedRow(seq, body)
+            self._bytes += size
+            self._stats["stores"] += 1
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.body) + self.ENTRY_OVERHEAD
+                self._stats["evictions"] += 1
+        return body
+
+    def discard(self, book_id):
+        with self._lock:
+            self._drop(book_id)
+
+    def clear(self):
+        with self._lock:
+            self._stats["invalidations"] += len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+            self.seq = None
+            self.generation = None
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data["entries"] = len(self._entries)
+            data["bytes"] = self._bytes
+            data["max_bytes"] = self.max_bytes
+            data["seq"] = self.seq
+        return data
+
+
+ROW_CACHE = RowCache(ROW_CACHE_BYTES)
+
+
+def normalize_query(query):
+    return urlencode(sorted(parse_qsl(query, keep_blank_values=True)))
+
+
+def make_etag(body):
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
 
-def get_conn():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+
+def accepted_encodings(header):
+    accepted = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name] = quality
+    return accepted
+
+
+def negotiate_encoding(header, available=None):
+    accepted = accepted_encodings(header)
+    preferred = ["br", "gzip"] if brotli is not None else ["gzip"]
+    for name in preferred:
+        if available is not None and name not in available:
+            continue
+        if accepted.get(name, accepted.get("*", 0)) > 0:
+            return name
+    return None
+
+
+def compress_body(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def variant_etag(etag, encoding):
+    return f'{etag[:-1]}-{encoding}"' if encoding else etag
+
+
+STATIC_VARIANTS = {}
+
+
+def precompress_static():
+    variants = {}
+    encodings = ["gzip", "br"] if brotli is not None else ["gzip"]
+    suffixes = {"gzip": ".gz", "br": ".br"}
+    try:
+        STATIC_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        return variants
+    for source in STATIC_DIR.rglob("*"):
+        if not source.is_file() or source.suffix not in STATIC_COMPRESS_SUFFIXES:
+            continue
+        raw = None
+        relative = source.relative_to(STATIC_DIR)
+        for encoding in encodings:
+            target = STATIC_CACHE_DIR / f"{relative}{suffixes[encoding]}"
+            try:
+                if not target.exists() or target.stat().st_mtime < source.stat().st_mtime:
+                    raw = raw if raw is not None else source.read_bytes()
+                    compressed = compress_body(raw, encoding)
+                    if len(compressed) >= source.stat().st_size:
+                        continue
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    tmp = target.with_name(target.name + ".tmp")
+                    tmp.write_bytes(compressed)
+                    os.replace(tmp, target)
+            except OSError:
+                continue
+            variants.setdefault(str(source), {})[encoding] = str(target)
+    STATIC_VARIANTS.clear()
+    STATIC_VARIANTS.update(variants)
+    return variants
+
+
+def etag_matches(header, etag):
+    if not header:
+        return False
+    candidates = [part.strip() for part in header.split(",")]
+    return "*" in candidates or etag in candidates
 
 
 def parse_bool(value):
@@ -35,6 +1009,12 @@ def parse_bool(value):
     return None
 
 
+def parse_csv_bool(value):
+    if value is None or not str(value).strip():
+        return None
+    return parse_bool(value)
+
+
 def parse_int(value):
     if value in (None, ""):
         return None
@@ -44,7 +1024,13 @@ def parse_int(value):
         return None
 
 
-def normalize_status(read_value):
+BOOK_STATUSES = {"Not Started", "Reading", "Paused", "Finished", "DNF"}
+
+
+def normalize_status(read_value, status=None):
+    status = str(status or "").strip()
+    if status in BOOK_STATUSES:
+        return status
     parsed = parse_bool(read_value)
     if parsed == 1:
         return "Finished"
@@ -53,297 +1039,3134 @@ def normalize_status(read_value):
     return "Not Started"
 
 
-def init_db():
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-    with get_conn() as conn:
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS books (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                author TEXT,
-                series_name TEXT,
-                series_number INTEGER,
-                is_series INTEGER,
-                pages INTEGER,
-                language TEXT,
-                genre TEXT,
-                subgenre TEXT,
-                status TEXT NOT NULL DEFAULT 'Not Started',
-                is_owned INTEGER,
-                is_nonfiction INTEGER,
-                purchase_year INTEGER,
-                purchase_location TEXT,
-                publisher TEXT,
-                format TEXT,
-                source TEXT,
-                rating INTEGER,
-                notes TEXT,
-                date_added TEXT,
-                date_started TEXT,
-                date_finished TEXT,
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL
-            )
-            """
+def create_books_table(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS books (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            author TEXT,
+            series_name TEXT,
+            series_number INTEGER,
+            is_series INTEGER,
+            pages INTEGER,
+            language TEXT,
+            genre TEXT,
+            subgenre TEXT,
+            status TEXT NOT NULL DEFAULT 'Not Started',
+            is_owned INTEGER,
+            is_nonfiction INTEGER,
+            purchase_year INTEGER,
+            purchase_location TEXT,
+            publisher TEXT,
+            format TEXT,
+            source TEXT,
+            rating INTEGER,
+            notes TEXT,
+            date_added TEXT,
+            date_started TEXT,
+            date_finished TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
         )
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_books_title ON books(title)")
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_books_author ON books(author)")
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_books_status ON books(status)")
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_books_genre ON books(genre)")
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_books_language ON books(language)")
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_books_title ON books(title)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_books_author ON books(author)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_books_status ON books(status)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_books_genre ON books(genre)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_books_language ON books(language)")
 
 
-BOOK_COLUMNS = [
-    "title",
-    "author",
-    "series_name",
-    "series_number",
-    "is_series",
-    "pages",
-    "language",
+def create_query_indexes(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_books_purchase_year ON books(purchase_year)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_books_created_at ON books(created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_books_status_title ON books(status, title, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_books_genre_title ON books(genre, title, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_books_language_title ON books(language, title, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_books_genre_year ON books(genre, purchase_year, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_books_status_year ON books(status, purchase_year, id)")
+
+
+LOOKUP_COLUMNS = ["author", "publisher", "genre", "subgenre", "language", "purchase_location"]
+VIEW_TRIGGERS = ["trg_books_view_insert", "trg_books_view_update", "trg_books_view_delete"]
+
+
+class RowRef:
+    def __init__(self, ref, normalized=False):
+        self.ref = ref
+        self.normalized = normalized
+
+    def column(self, col):
+        return f"{col}_id" if self.normalized and col in LOOKUP_COLUMNS else col
+
+    def __getitem__(self, col):
+        if self.normalized and col in LOOKUP_COLUMNS:
+            return f"(SELECT value FROM lookup_{col} WHERE id = {self.ref}.{col}_id)"
+        return f"{self.ref}.{col}"
+
+
+def storage_mode(conn):
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = 'books'").fetchone()
+    return "normalized" if row and row[0] == "view" else "wide"
+
+
+def book_table(conn):
+    return "book_rows" if storage_mode(conn) == "normalized" else "books"
+
+
+def trigger_target(conn):
+    normalized = storage_mode(conn) == "normalized"
+    table = "book_rows" if normalized else "books"
+    return table, RowRef("NEW", normalized), RowRef("OLD", normalized)
+
+
+STATS_DIMENSIONS = [
+    ("total", "'all'"),
+    ("status", "{r[status]}"),
+    ("genre", "{r[genre]}"),
+    ("subgenre", "{r[subgenre]}"),
+    ("language", "{r[language]}"),
+    (
+        "author",
+        "COALESCE((SELECT canonical FROM name_aliases WHERE kind = 'author' AND alias = {r[author]}), {r[author]})",
+    ),
+    (
+        "publisher",
+        "COALESCE((SELECT canonical FROM name_aliases WHERE kind = 'publisher' AND alias = {r[publisher]}), "
+        "{r[publisher]})",
+    ),
+    ("purchase_year", "{r[purchase_year]}"),
+    (
+        "ownership",
+        "CASE WHEN {r[is_owned]} = 1 THEN 'Owned' WHEN {r[is_owned]} = 0 THEN 'Not Owned' ELSE 'Unknown' END",
+    ),
+    (
+        "nonfiction",
+        "CASE WHEN {r[is_nonfiction]} = 1 THEN 'Nonfiction' WHEN {r[is_nonfiction]} = 0 THEN 'Fiction' "
+        "ELSE 'Unknown' END",
+    ),
+]
+STATS_SOURCE_COLUMNS = [
+    "status",
     "genre",
     "subgenre",
-    "status",
+    "language",
+    "author",
+    "publisher",
+    "purchase_year",
     "is_owned",
     "is_nonfiction",
-    "purchase_year",
-    "purchase_location",
-    "publisher",
-    "format",
-    "source",
-    "rating",
-    "notes",
-    "date_added",
-    "date_started",
-    "date_finished",
+    "pages",
 ]
+STATS_TRIGGERS = ["trg_book_stats_insert", "trg_book_stats_delete", "trg_book_stats_update"]
 
 
-def bootstrap_data():
-    default_csv = PROJECT_ROOT / "lib_updated.csv"
-    if not default_csv.exists():
-        return 0
-    with get_conn() as conn:
-        existing = conn.execute("SELECT COUNT(*) FROM books").fetchone()[0]
-    if existing > 0:
-        return 0
-    return import_csv(default_csv)
+def _stats_values(ref):
+    return ", ".join(f"('{dim}', {expr.format(r=ref)})" for dim, expr in STATS_DIMENSIONS)
 
 
-def sanitize_book_payload(payload):
-    data = {}
-    data["title"] = str(payload.get("title", "")).strip()
-    data["author"] = str(payload.get("author", "")).strip() or None
-    data["series_name"] = str(payload.get("series_name", "")).strip() or None
-    data["series_number"] = parse_int(payload.get("series_number"))
-    data["is_series"] = parse_bool(payload.get("is_series"))
-    data["pages"] = parse_int(payload.get("pages"))
-    data["language"] = str(payload.get("language", "")).strip() or None
-    data["genre"] = str(payload.get("genre", "")).strip() or None
-    data["subgenre"] = str(payload.get("subgenre", "")).strip() or None
+def _stats_add_sql(ref):
+    return f"""
+        INSERT INTO book_stats (dim, label, books, finished, pages_sum, pages_count)
+        SELECT column1, column2, 1,
+               CASE WHEN {ref['status']} = 'Finished' THEN 1 ELSE 0 END,
+               COALESCE({ref['pages']}, 0),
+               CASE WHEN {ref['pages']} IS NOT NULL THEN 1 ELSE 0 END
+        FROM (VALUES {_stats_values(ref)})
+        WHERE column2 IS NOT NULL AND column2 != ''
+        ON CONFLICT (dim, label) DO UPDATE SET
+            books = books + excluded.books,
+            finished = finished + excluded.finished,
+            pages_sum = pages_sum + excluded.pages_sum,
+            pages_count = pages_count + excluded.pages_count;
+    """
+
+
+def _stats_remove_sql(ref):
+    return f"""
+        UPDATE book_stats SET
+            books = books - 1,
+            finished = finished - CASE WHEN {ref['status']} = 'Finished' THEN 1 ELSE 0 END,
+            pages_sum = pages_sum - COALESCE({ref['pages']}, 0),
+            pages_count = pages_count - CASE WHEN {ref['pages']} IS NOT NULL THEN 1 ELSE 0 END
+        WHERE (dim, label) IN (VALUES {_stats_values(ref)});
+        DELETE FROM book_stats WHERE books <= 0;
+    """
+
+
+def stats_scan_sql(dims=None):
+    parts = [
+        f"""
+        SELECT '{dim}' AS dim, {expr.format(r=RowRef('books'))} AS label,
+               CASE WHEN status = 'Finished' THEN 1 ELSE 0 END AS finished, pages
+        FROM books
+        """
+        for dim, expr in STATS_DIMENSIONS
+        if dims is None or dim in dims
+    ]
+    return f"""
+        SELECT dim, label, COUNT(*) AS books, SUM(finished) AS finished,
+               COALESCE(SUM(pages), 0) AS pages_sum, COUNT(pages) AS pages_count
+        FROM ({' UNION ALL '.join(parts)})
+        WHERE label IS NOT NULL AND label != ''
+        GROUP BY dim, label
+    """
+
+
+def create_stats_triggers(conn):
+    table, new, old = trigger_target(conn)
+    columns = ", ".join(new.column(col) for col in STATS_SOURCE_COLUMNS)
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_book_stats_insert AFTER INSERT ON {table}
+        BEGIN {_stats_add_sql(new)} END
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_book_stats_delete AFTER DELETE ON {table}
+        BEGIN {_stats_remove_sql(old)} END
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_book_stats_update AFTER UPDATE OF {columns} ON {table}
+        BEGIN {_stats_remove_sql(old)} {_stats_add_sql(new)} END
+        """
+    )
+
+
+def drop_stats_triggers(conn):
+    for name in STATS_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def rebuild_book_stats(conn):
+    conn.execute("DELETE FROM book_stats")
+    conn.execute(
+        f"""
+        INSERT INTO book_stats (dim, label, books, finished, pages_sum, pages_count)
+        {stats_scan_sql()}
+        """
+    )
+    create_stats_triggers(conn)
+
+
+def rebuild_stats_dim(conn, dim):
+    conn.execute("DELETE FROM book_stats WHERE dim = ?", (dim,))
+    conn.execute(
+        f"""
+        INSERT INTO book_stats (dim, label, books, finished, pages_sum, pages_count)
+        {stats_scan_sql([dim])}
+        """
+    )
+
+
+def init_book_stats(conn):
+    create_alias_table(conn)
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'book_stats'").fetchone()
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS book_stats (
+            dim TEXT NOT NULL,
+            label NOT NULL,
+            books INTEGER NOT NULL DEFAULT 0,
+            finished INTEGER NOT NULL DEFAULT 0,
+            pages_sum INTEGER NOT NULL DEFAULT 0,
+            pages_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dim, label)
+        ) WITHOUT ROWID
+        """
+    )
+    if exists:
+        create_stats_triggers(conn)
+    else:
+        rebuild_book_stats(conn)
+
+
+def check_book_stats(conn):
+    columns = ["books", "finished", "pages_sum", "pages_count"]
+    stored = {
+        (r["dim"], r["label"]): tuple(r[c] for c in columns)
+        for r in conn.execute("SELECT * FROM book_stats")
+    }
+    scanned = {
+        (r["dim"], r["label"]): tuple(r[c] for c in columns)
+        for r in conn.execute(stats_scan_sql())
+    }
+    mismatches = []
+    for key in sorted(stored.keys() | scanned.keys(), key=lambda k: (k[0], str(k[1]))):
+        if stored.get(key) != scanned.get(key):
+            mismatches.append(
+                {
+                    "dim": key[0],
+                    "label": key[1],
+                    "stored": dict(zip(columns, stored[key])) if key in stored else None,
+                    "scanned": dict(zip(columns, scanned[key])) if key in scanned else None,
+                }
+            )
+    return mismatches
+
+
+ALIAS_KINDS = ["author", "publisher"]
+
+
+def create_alias_table(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS name_aliases (
+            kind TEXT NOT NULL,
+            alias TEXT NOT NULL,
+            canonical TEXT NOT NULL,
+            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (kind, alias)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_name_aliases_canonical ON name_aliases(kind, canonical)")
+
+
+def init_name_aliases(conn):
+    create_alias_table(conn)
+    drop_stats_triggers(conn)
+    rebuild_book_stats(conn)
+
+
+def load_aliases(conn):
+    aliases = {kind: {} for kind in ALIAS_KINDS}
+    for row in conn.execute("SELECT kind, alias, canonical FROM name_aliases"):
+        aliases.setdefault(row["kind"], {})[row["alias"]] = row["canonical"]
+    return aliases
+
+
+def resolve_alias(conn, kind, value):
+    row = conn.execute("SELECT canonical FROM name_aliases WHERE kind = ? AND alias = ?", (kind, value)).fetchone()
+    return row["canonical"] if row else value
+
+
+def set_aliases(conn, kind, canonical, aliases):
+    canonical = resolve_alias(conn, kind, canonical)
+    aliases = sorted({a for a in aliases if a != canonical})
+    if not aliases:
+        return canonical, []
+    marks = ", ".join("?" for _ in aliases)
+    conn.execute(
+        f"UPDATE name_aliases SET canonical = ? WHERE kind = ? AND canonical IN ({marks})",
+        [canonical, kind, *aliases],
+    )
+    conn.executemany(
+        """
+        INSERT INTO name_aliases (kind, alias, canonical) VALUES (?, ?, ?)
+        ON CONFLICT (kind, alias) DO UPDATE SET canonical = excluded.canonical
+        """,
+        [(kind, alias, canonical) for alias in aliases],
+    )
+    rebuild_stats_dim(conn, kind)
+    return canonical, aliases
+
+
+def remove_alias(conn, kind, alias):
+    removed = conn.execute("DELETE FROM name_aliases WHERE kind = ? AND alias = ?", (kind, alias)).rowcount
+    if removed:
+        rebuild_stats_dim(conn, kind)
+    return removed
+
+
+def _detect_fts5():
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute("CREATE VIRTUAL TABLE fts_probe USING fts5(body)")
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+
+
+FTS5_AVAILABLE = _detect_fts5()
+SEARCH_COLUMNS = ["title", "author", "series_name", "publisher", "genre", "subgenre", "notes"]
+SEARCH_WEIGHTS = [10.0, 6.0, 4.0, 2.0, 1.5, 1.5, 1.0]
+SEARCH_TRIGGERS = ["trg_books_fts_insert", "trg_books_fts_delete", "trg_books_fts_update"]
+# unicode61 strips combining marks but Turkish dotless i has no decomposition.
+SEARCH_FOLDS = [("ı", "i"), ("İ", "i")]
+
+
+def _search_fold_sql(expr):
+    for src, dst in SEARCH_FOLDS:
+        expr = f"replace({expr}, '{src}', '{dst}')"
+    return expr
+
+
+def fold_search_text(text):
+    for src, dst in SEARCH_FOLDS:
+        text = text.replace(src, dst)
+    return text
+
+
+def build_fts_query(search):
+    tokens = re.findall(r"\w+", fold_search_text(search))
+    return " ".join('"' + token.replace('"', '""') + '"*' for token in tokens)
+
+
+def _search_values(ref):
+    return ", ".join(_search_fold_sql(ref[col]) for col in SEARCH_COLUMNS)
+
+
+def create_search_triggers(conn):
+    table, new, _ = trigger_target(conn)
+    columns = ", ".join(SEARCH_COLUMNS)
+    source = ", ".join(new.column(col) for col in SEARCH_COLUMNS)
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_books_fts_insert AFTER INSERT ON {table}
+        BEGIN
+            INSERT INTO books_fts (rowid, {columns}) VALUES (NEW.id, {_search_values(new)});
+        END
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_books_fts_delete AFTER DELETE ON {table}
+        BEGIN
+            DELETE FROM books_fts WHERE rowid = OLD.id;
+        END
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_books_fts_update AFTER UPDATE OF {source} ON {table}
+        BEGIN
+            DELETE FROM books_fts WHERE rowid = OLD.id;
+            INSERT INTO books_fts (rowid, {columns}) VALUES (NEW.id, {_search_values(new)});
+        END
+        """
+    )
+
+
+def drop_search_triggers(conn):
+    for name in SEARCH_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def rebuild_search_index(conn):
+    if not FTS5_AVAILABLE:
+        return
+    columns = ", ".join(SEARCH_COLUMNS)
+    conn.execute("DELETE FROM books_fts")
+    conn.execute(f"INSERT INTO books_fts (rowid, {columns}) SELECT id, {_search_values(RowRef('books'))} FROM books")
+    create_search_triggers(conn)
+
+
+def init_search_index(conn):
+    if not FTS5_AVAILABLE:
+        return
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'books_fts'").fetchone()
+    conn.execute(
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+            {', '.join(SEARCH_COLUMNS)},
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+        """
+    )
+    if exists:
+        create_search_triggers(conn)
+    else:
+        rebuild_search_index(conn)
+
+
+CHANGE_TRIGGERS = [
+    "trg_book_changes_insert",
+    "trg_book_changes_update",
+    "trg_book_changes_delete",
+    "trg_book_changes_prune",
+]
+
+
+def create_change_triggers(conn):
+    table = trigger_target(conn)[0]
+    for event, ref in [("insert", "NEW"), ("update", "NEW"), ("delete", "OLD")]:
+        conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_book_changes_{event} AFTER {event.upper()} ON {table}
+            BEGIN
+                INSERT INTO book_changes (book_id, op) VALUES ({ref}.id, '{event}');
+            END
+            """
+        )
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_book_changes_prune AFTER INSERT ON book_changes
+        BEGIN
+            DELETE FROM book_changes WHERE seq <= NEW.seq - {CHANGE_LOG_KEEP};
+        END
+        """
+    )
+
+
+def drop_change_triggers(conn):
+    for name in CHANGE_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def rebuild_change_log(conn):
+    conn.execute("INSERT INTO book_changes (book_id, op) VALUES (NULL, 'reset')")
+    create_change_triggers(conn)
+
+
+def init_change_log(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS book_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            book_id INTEGER,
+            op TEXT NOT NULL,
+            changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    create_change_triggers(conn)
+
+
+def drop_derived_triggers(conn):
+    drop_stats_triggers(conn)
+    drop_search_triggers(conn)
+    drop_change_triggers(conn)
+
+
+def rebuild_derived(conn):
+    rebuild_book_stats(conn)
+    rebuild_search_index(conn)
+    rebuild_change_log(conn)
+
+
+def create_book_rows(conn):
+    for col in LOOKUP_COLUMNS:
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS lookup_{col} (id INTEGER PRIMARY KEY, value TEXT NOT NULL UNIQUE)"
+        )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS book_rows (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            author_id INTEGER REFERENCES lookup_author(id),
+            series_name TEXT,
+            series_number INTEGER,
+            is_series INTEGER,
+            pages INTEGER,
+            language_id INTEGER REFERENCES lookup_language(id),
+            genre_id INTEGER REFERENCES lookup_genre(id),
+            subgenre_id INTEGER REFERENCES lookup_subgenre(id),
+            status TEXT NOT NULL DEFAULT 'Not Started',
+            is_owned INTEGER,
+            is_nonfiction INTEGER,
+            purchase_year INTEGER,
+            purchase_location_id INTEGER REFERENCES lookup_purchase_location(id),
+            publisher_id INTEGER REFERENCES lookup_publisher(id),
+            format TEXT,
+            source TEXT,
+            rating INTEGER,
+            notes TEXT,
+            date_added TEXT,
+            date_started TEXT,
+            date_finished TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+        """
+    )
+
+
+def _lookup_id_sql(ref, col):
+    return f"(SELECT id FROM lookup_{col} WHERE value = {ref}.{col})"
+
+
+def _view_insert_value(col):
+    if col in LOOKUP_COLUMNS:
+        return _lookup_id_sql("NEW", col)
+    if col == "status":
+        return "COALESCE(NEW.status, 'Not Started')"
+    return f"NEW.{col}"
+
+
+def _lookup_insert_sql(ref):
+    return "\n".join(
+        f"INSERT OR IGNORE INTO lookup_{col} (value) SELECT {ref}.{col} WHERE {ref}.{col} IS NOT NULL;"
+        for col in LOOKUP_COLUMNS
+    )
+
+
+def create_books_view(conn):
+    columns = ["id", *BOOK_COLUMNS, "created_at", "updated_at"]
+    ref = RowRef("book_rows", True)
+    select = ", ".join(f"{ref[c]} AS {c}" for c in columns)
+    conn.execute(f"CREATE VIEW books AS SELECT {select} FROM book_rows")
+    stored = ", ".join(ref.column(c) for c in columns)
+    values = ", ".join(_view_insert_value(c) for c in columns)
+    conn.execute(
+        f"""
+        CREATE TRIGGER trg_books_view_insert INSTEAD OF INSERT ON books
+        BEGIN
+            {_lookup_insert_sql('NEW')}
+            INSERT INTO book_rows ({stored}) VALUES ({values});
+        END
+        """
+    )
+    assignments = ", ".join(
+        f"{c}_id = {_lookup_id_sql('NEW', c)}" if c in LOOKUP_COLUMNS else f"{c} = NEW.{c}" for c in columns[1:]
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER trg_books_view_update INSTEAD OF UPDATE ON books
+        BEGIN
+            {_lookup_insert_sql('NEW')}
+            UPDATE book_rows SET {assignments} WHERE id = OLD.id;
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER trg_books_view_delete INSTEAD OF DELETE ON books
+        BEGIN
+            DELETE FROM book_rows WHERE id = OLD.id;
+        END
+        """
+    )
+
+
+def book_indexes(conn, table):
+    indexes = []
+    for row in conn.execute(f"PRAGMA index_list({table})").fetchall():
+        if row["origin"] != "c" or row["partial"]:
+            continue
+        columns = [r["name"] for r in conn.execute(f"PRAGMA index_info({row['name']})")]
+        if None not in columns:
+            indexes.append((row["name"], bool(row["unique"]), columns))
+    return indexes
+
+
+def recreate_book_indexes(conn, indexes, table, rename):
+    for name, unique, columns in indexes:
+        conn.execute(
+            f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} "
+            f"ON {table}({', '.join(rename(c) for c in columns)})"
+        )
+
+
+def _copy_book_sequence(conn, source, target):
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (source,)).fetchone()
+    if row is None:
+        return
+    conn.execute("DELETE FROM sqlite_sequence WHERE name = ?", (target,))
+    conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (target, row["seq"]))
+
+
+def normalize_storage(conn):
+    indexes = book_indexes(conn, "books")
+    drop_derived_triggers(conn)
+    create_book_rows(conn)
+    for col in LOOKUP_COLUMNS:
+        conn.execute(
+            f"INSERT OR IGNORE INTO lookup_{col} (value) SELECT DISTINCT {col} FROM books WHERE {col} IS NOT NULL"
+        )
+    columns = ["id", *BOOK_COLUMNS, "created_at", "updated_at"]
+    stored = RowRef("book_rows", True)
+    conn.execute(
+        f"""
+        INSERT INTO book_rows ({', '.join(stored.column(c) for c in columns)})
+        SELECT {', '.join(_lookup_id_sql('books', c) if c in LOOKUP_COLUMNS else c for c in columns)}
+        FROM books
+        """
+    )
+    _copy_book_sequence(conn, "books", "book_rows")
+    conn.execute("DROP TABLE books")
+    create_books_view(conn)
+    recreate_book_indexes(conn, indexes, "book_rows", stored.column)
+    rebuild_derived(conn)
+
+
+def widen_storage(conn):
+    indexes = book_indexes(conn, "book_rows")
+    drop_derived_triggers(conn)
+    conn.execute("CREATE TEMP TABLE books_copy AS SELECT * FROM books")
+    conn.execute("DROP VIEW books")
+    create_books_table(conn)
+    conn.execute("INSERT INTO books SELECT * FROM temp.books_copy")
+    conn.execute("DROP TABLE temp.books_copy")
+    _copy_book_sequence(conn, "book_rows", "books")
+    conn.execute("DROP TABLE book_rows")
+    conn.execute("DELETE FROM sqlite_sequence WHERE name = 'book_rows'")
+    for col in LOOKUP_COLUMNS:
+        conn.execute(f"DROP TABLE lookup_{col}")
+    lookups = {f"{col}_id": col for col in LOOKUP_COLUMNS}
+    recreate_book_indexes(conn, indexes, "books", lambda c: lookups.get(c, c))
+    rebuild_derived(conn)
+
+
+def prune_lookups(conn):
+    for col in LOOKUP_COLUMNS:
+        conn.execute(
+            f"DELETE FROM lookup_{col} WHERE id NOT IN (SELECT {col}_id FROM book_rows WHERE {col}_id IS NOT NULL)"
+        )
+
+
+MIGRATIONS = [
+    create_books_table,
+    create_query_indexes,
+    init_book_stats,
+    init_search_index,
+    init_change_log,
+    init_name_aliases,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    version = schema_version(conn)
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        migration(conn)
+        conn.execute(f"PRAGMA user_version = {number}")
+    return version
+
+
+def create_neighbor_tables(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS book_neighbors (
+            book_id INTEGER NOT NULL,
+            rank INTEGER NOT NULL,
+            neighbor_id INTEGER NOT NULL,
+            score REAL NOT NULL,
+            PRIMARY KEY (book_id, rank)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_book_neighbors_neighbor ON book_neighbors(neighbor_id)")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS book_neighbors_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            seq INTEGER NOT NULL,
+            k INTEGER NOT NULL
+        )
+        """
+    )
+
+
+def init_similar_db():
+    SIMILAR_DB.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(SIMILAR_DB, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode = WAL")
+        create_neighbor_tables(conn)
+    finally:
+        conn.close()
+
+
+def init_db():
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    init_similar_db()
+    target = "normalized" if STORAGE_MODE == "normalized" else "wide"
+    if DB_PATH.exists():
+        with read_conn() as conn:
+            if schema_version(conn) >= SCHEMA_VERSION and storage_mode(conn) == target:
+                return
+    with write_conn() as conn:
+        storage = storage_mode(conn)
+        if storage == "normalized" and schema_version(conn) < SCHEMA_VERSION:
+            widen_storage(conn)
+        previous = migrate(conn)
+        if target == "normalized" and storage_mode(conn) == "wide":
+            normalize_storage(conn)
+        elif target == "wide" and storage_mode(conn) == "normalized":
+            widen_storage(conn)
+    if previous < SCHEMA_VERSION:
+        print(f"Migrated DB schema from v{previous} to v{SCHEMA_VERSION}")
+    if storage != target:
+        conn = sqlite3.connect(DB_PATH, isolation_level=None)
+        try:
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+        print(f"Converted books storage from {storage} to {target}")
+
+
+def stats_groups(conn, dim, order_sql="value DESC, label ASC", limit=None, value_sql="books"):
+    limit_sql = f"LIMIT {int(limit)}" if limit else ""
+    return conn.execute(
+        f"""
+        SELECT label, {value_sql} AS value
+        FROM book_stats
+        WHERE dim = ?
+        ORDER BY {order_sql}
+        {limit_sql}
+        """,
+        (dim,),
+    ).fetchall()
+
+
+def stats_group_items(conn, dim, order_sql="value DESC, label ASC", limit=None, value_sql="books"):
+    if not JSON_FAST_PATH:
+        return [dict(r) for r in stats_groups(conn, dim, order_sql, limit, value_sql)]
+    limit_sql = f"LIMIT {int(limit)}" if limit else ""
+    rows = conn.execute(
+        f"""
+        SELECT json_object('label', label, 'value', {value_sql}), {value_sql} AS value
+        FROM book_stats
+        WHERE dim = ?
+        ORDER BY {order_sql}
+        {limit_sql}
+        """,
+        (dim,),
+    ).fetchall()
+    return RawJSON("[" + ",".join(r[0] for r in rows) + "]")
+
+
+BOOK_COLUMNS = [
+    "title",
+    "author",
+    "series_name",
+    "series_number",
+    "is_series",
+    "pages",
+    "language",
+    "genre",
+    "subgenre",
+    "status",
+    "is_owned",
+    "is_nonfiction",
+    "purchase_year",
+    "purchase_location",
+    "publisher",
+    "format",
+    "source",
+    "rating",
+    "notes",
+    "date_added",
+    "date_started",
+    "date_finished",
+]
+
+
+def bootstrap_data():
+    default_csv = PROJECT_ROOT / "lib_updated.csv"
+    if not default_csv.exists():
+        return 0
+    with read_conn() as conn:
+        existing = conn.execute("SELECT EXISTS (SELECT 1 FROM books)").fetchone()[0]
+    if existing:
+        return 0
+    return import_csv(default_csv)
+
+
+def sanitize_book_payload(payload):
+    data = {}
+    data["title"] = str(payload.get("title", "")).strip()
+    data["author"] = str(payload.get("author", "")).strip() or None
+    data["series_name"] = str(payload.get("series_name", "")).strip() or None
+    data["series_number"] = parse_int(payload.get("series_number"))
+    data["is_series"] = parse_bool(payload.get("is_series"))
+    data["pages"] = parse_int(payload.get("pages"))
+    data["language"] = str(payload.get("language", "")).strip() or None
+    data["genre"] = str(payload.get("genre", "")).strip() or None
+    data["subgenre"] = str(payload.get("subgenre", "")).strip() or None
+
+    status = str(payload.get("status", "Not Started")).strip()
+    data["status"] = status if status in BOOK_STATUSES else "Not Started"
+
+    data["is_owned"] = parse_bool(payload.get("is_owned"))
+    data["is_nonfiction"] = parse_bool(payload.get("is_nonfiction"))
+    data["purchase_year"] = parse_int(payload.get("purchase_year"))
+    data["purchase_location"] = str(payload.get("purchase_location", "")).strip() or None
+    data["publisher"] = str(payload.get("publisher", "")).strip() or None
+    data["format"] = str(payload.get("format", "")).strip() or None
+    data["source"] = str(payload.get("source", "")).strip() or None
+    data["rating"] = parse_int(payload.get("rating"))
+    data["notes"] = str(payload.get("notes", "")).strip() or None
+    data["date_added"] = str(payload.get("date_added", "")).strip() or None
+    data["date_started"] = str(payload.get("date_started", "")).strip() or None
+    data["date_finished"] = str(payload.get("date_finished", "")).strip() or None
+    return data
+
+
+BOOL_COLUMNS = ["is_series", "is_owned", "is_nonfiction"]
+BOOK_JSON_COLUMNS = ["id", *BOOK_COLUMNS, "created_at", "updated_at"]
+
+
+def row_to_dict(row):
+    item = dict(row)
+    for key in BOOL_COLUMNS:
+        if item.get(key) is not None:
+            item[key] = bool(item[key])
+    return item
+
+
+class RawJSON:
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        self.text = text
+
+
+def dumps_json(payload):
+    if orjson is not None and JSON_FAST_PATH:
+        try:
+            return orjson.dumps(payload)
+        except TypeError:
+            pass
+    return json.dumps(payload).encode("utf-8")
+
+
+def encode_json(payload):
+    if isinstance(payload, bytes):
+        return payload
+    if not isinstance(payload, dict) or not any(isinstance(v, RawJSON) for v in payload.values()):
+        return dumps_json(payload)
+    parts = []
+    for key, value in payload.items():
+        encoded = value.text.encode("utf-8") if isinstance(value, RawJSON) else dumps_json(value)
+        parts.append(dumps_json(key) + b": " + encoded)
+    return b"{" + b", ".join(parts) + b"}"
+
+
+def book_json_sql(ref="books"):
+    fields = []
+    for col in BOOK_JSON_COLUMNS:
+        expr = f"{ref}.{col}"
+        if col in BOOL_COLUMNS:
+            expr = f"json(CASE WHEN {expr} IS NULL THEN NULL WHEN {expr} THEN 'true' ELSE 'false' END)"
+        fields.append(f"'{col}', {expr}")
+    return f"json_object({', '.join(fields)})"
+
+
+BOOK_JSON_SQL = book_json_sql()
+
+
+def book_select_sql():
+    return f"{BOOK_JSON_SQL} AS _json" if JSON_FAST_PATH else "books.*"
+
+
+def book_items(rows):
+    if JSON_FAST_PATH:
+        return RawJSON("[" + ",".join(r["_json"] for r in rows) + "]")
+    return [{k: v for k, v in row_to_dict(r).items() if not k.startswith("_")} for r in rows]
+
+
+SORT_MAP = {
+    "title": "title",
+    "author": "author",
+    "status": "status",
+    "genre": "genre",
+    "language": "language",
+    "purchase_year": "purchase_year",
+    "created_at": "created_at",
+}
+FILTER_KEYS = ["search", "status", "genre", "language", "purchase_year"]
+FACET_KEYS = ["status", "genre", "language", "purchase_year"]
+
+
+class CursorError(ValueError):
+    pass
+
+
+def parse_book_filters(params):
+    return {key: params.get(key, [""])[0].strip() for key in FILTER_KEYS}
+
+
+def build_book_filter_sql(filters):
+    from_sql = "books"
+    where = []
+    args = []
+    search = filters.get("search", "")
+    fts_query = build_fts_query(search) if search and FTS5_AVAILABLE else ""
+    if fts_query:
+        weights = ", ".join(str(w) for w in SEARCH_WEIGHTS)
+        from_sql = f"""
+            books JOIN (
+                SELECT rowid AS fts_id, bm25(books_fts, {weights}) AS fts_rank
+                FROM books_fts WHERE books_fts MATCH ?
+            ) AS fts ON fts.fts_id = books.id
+        """
+        args.append(fts_query)
+    elif search:
+        where.append("(title LIKE ? OR author LIKE ?)")
+        like = f"%{search}%"
+        args.extend([like, like])
+    for key in FACET_KEYS:
+        if filters.get(key):
+            where.append(f"{key} = ?")
+            args.append(filter_arg(key, filters[key]))
+    return from_sql, where, args, fts_query
+
+
+def filter_arg(key, value):
+    return parse_int(value) if key == "purchase_year" else value
+
+
+def parse_facets(params):
+    names = [f.strip() for v in params.get("facets", []) for f in v.split(",") if f.strip()]
+    unknown = [f for f in names if f not in FACET_KEYS]
+    if unknown:
+        raise ValueError(f"Unknown facets: {', '.join(unknown)}")
+    return list(dict.fromkeys(names))
+
+
+def book_facets(conn, filters, facets):
+    active = [k for k in facets if filters.get(k)]
+    base_filters = {k: v for k, v in filters.items() if k not in active}
+    from_sql, where, args, _ = build_book_filter_sql(base_filters)
+    if len(active) > 1:
+        where.append(f"({' + '.join(f'(books.{k} IS ?)' for k in active)}) >= {len(active) - 1}")
+        args.extend(filter_arg(k, filters[k]) for k in active)
+    where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+    columns = ", ".join(f"books.{k} AS {k}" for k in facets)
+    parts = []
+    for facet in facets:
+        others = [k for k in active if k != facet]
+        conditions = [f"{facet} IS NOT NULL", f"{facet} != ''", *[f"{k} IS ?" for k in others]]
+        args.extend(filter_arg(k, filters[k]) for k in others)
+        parts.append(
+            f"SELECT '{facet}' AS facet, {facet} AS value, COUNT(*) AS count FROM base "
+            f"WHERE {' AND '.join(conditions)} GROUP BY {facet}"
+        )
+    rows = conn.execute(
+        f"WITH base AS (SELECT {columns} FROM {from_sql} {where_sql}) {' UNION ALL '.join(parts)}",
+        args,
+    ).fetchall()
+    result = {facet: [] for facet in facets}
+    for row in rows:
+        result[row["facet"]].append({"value": row["value"], "count": row["count"]})
+    for values in result.values():
+        values.sort(key=lambda v: (-v["count"], v["value"]))
+    return result
+
+
+def encode_cursor(sort, order, value, book_id):
+    raw = json.dumps([sort, order, value, book_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token, sort, order):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        cursor_sort, cursor_order, value, book_id = json.loads(raw.decode("utf-8"))
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise CursorError("Invalid cursor")
+    if cursor_sort != sort or cursor_order != order or not isinstance(book_id, int):
+        raise CursorError("Cursor does not match sort order")
+    return value, book_id
+
+
+def keyset_predicate(sort_col, order, value, book_id):
+    if order == "desc":
+        if value is None:
+            return f"({sort_col} IS NULL AND id > ?)", [book_id]
+        return f"({sort_col} < ? OR ({sort_col} = ? AND id > ?) OR {sort_col} IS NULL)", [value, value, book_id]
+    if value is None:
+        return f"({sort_col} IS NOT NULL OR id > ?)", [book_id]
+    return f"(({sort_col}, id) > (?, ?))", [value, book_id]
+
+
+def estimate_book_total(conn, filters):
+    if filters.get("search"):
+        return None
+    counts = []
+    for key in FACET_KEYS:
+        if filters.get(key):
+            row = conn.execute(
+                "SELECT books FROM book_stats WHERE dim = ? AND label = ?", (key, filter_arg(key, filters[key]))
+            ).fetchone()
+            counts.append(row["books"] if row else 0)
+    if not counts:
+        row = conn.execute("SELECT books FROM book_stats WHERE dim = 'total'").fetchone()
+        counts.append(row["books"] if row else 0)
+    return min(counts)
+
+
+IMPORT_UPSERT_COLUMNS = [
+    "is_series",
+    "pages",
+    "language",
+    "genre",
+    "subgenre",
+    "status",
+    "is_owned",
+    "is_nonfiction",
+    "purchase_year",
+    "purchase_location",
+    "publisher",
+]
+IMPORT_ERROR_LIMIT = 20
+
+
+def csv_row_to_record(row, now):
+    title = str(row.get("Name", "")).strip()
+    if not title:
+        return None
+    return {
+        "title": title,
+        "author": str(row.get("Author", "")).strip() or None,
+        "series_name": None,
+        "series_number": None,
+        "is_series": parse_csv_bool(row.get("Series")),
+        "pages": parse_int(row.get("# of Pages")),
+        "language": str(row.get("Language", "")).strip() or None,
+        "genre": str(row.get("Genre", "")).strip() or None,
+        "subgenre": str(row.get("Subgenre", "")).strip() or None,
+        "status": normalize_status(row.get("Read"), row.get("Status")),
+        "is_owned": parse_csv_bool(row.get("Home?")),
+        "is_nonfiction": parse_csv_bool(row.get("Non Fiction")),
+        "purchase_year": parse_int(row.get("Purchase Year")),
+        "purchase_location": str(row.get("Purchase Location", "")).strip() or None,
+        "publisher": str(row.get("Publisher", "")).strip() or None,
+        "format": None,
+        "source": None,
+        "rating": None,
+        "notes": None,
+        "date_added": None,
+        "date_started": None,
+        "date_finished": None,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def iter_csv_records(csv_file, now, result):
+    import csv
+
+    with csv_file.open("r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as exc:
+                _record_import_error(result, reader.line_num, str(exc))
+                continue
+            record = csv_row_to_record(row, now)
+            if record is None:
+                result["skipped"] += 1
+                continue
+            record["_line"] = reader.line_num
+            yield record
+
+
+def apply_record_aliases(records, aliases):
+    for record in records:
+        for kind in ALIAS_KINDS:
+            value = record[kind]
+            if value is not None:
+                record[kind] = aliases[kind].get(value, value)
+        yield record
+
+
+def iter_batches(records, size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _record_import_error(result, line, message):
+    result["failed"] += 1
+    if len(result["errors"]) < IMPORT_ERROR_LIMIT:
+        result["errors"].append({"line": line, "error": message})
+
+
+INSERT_BOOK_SQL = f"""
+    INSERT INTO books ({', '.join(BOOK_COLUMNS)}, created_at, updated_at)
+    VALUES ({', '.join(':' + col for col in BOOK_COLUMNS)}, :created_at, :updated_at)
+"""
+UPSERT_MATCH_SQL = """
+    SELECT id FROM books
+    WHERE title = :title
+      AND (author IS :author OR author IN (SELECT alias FROM name_aliases WHERE kind = 'author' AND canonical = :author))
+"""
+UPSERT_UPDATE_SQL = f"""
+    UPDATE books SET {', '.join(f'{col} = :{col}' for col in IMPORT_UPSERT_COLUMNS)}, updated_at = :updated_at
+    WHERE id = :id
+"""
+
+
+def _insert_batch(conn, batch, result):
+    try:
+        conn.execute("SAVEPOINT import_batch")
+        conn.executemany(INSERT_BOOK_SQL, batch)
+        conn.execute("RELEASE import_batch")
+        result["inserted"] += len(batch)
+        return
+    except sqlite3.Error:
+        conn.execute("ROLLBACK TO import_batch")
+        conn.execute("RELEASE import_batch")
+    for record in batch:
+        try:
+            conn.execute(INSERT_BOOK_SQL, record)
+            result["inserted"] += 1
+        except sqlite3.Error as exc:
+            _record_import_error(result, record["_line"], str(exc))
+
+
+def _upsert_batch(conn, batch, result):
+    for record in batch:
+        try:
+            matches = conn.execute(UPSERT_MATCH_SQL, record).fetchall()
+            if matches:
+                conn.executemany(UPSERT_UPDATE_SQL, [{**record, "id": row["id"]} for row in matches])
+                result["updated"] += 1
+            else:
+                conn.execute(INSERT_BOOK_SQL, record)
+                result["inserted"] += 1
+        except sqlite3.Error as exc:
+            _record_import_error(result, record["_line"], str(exc))
+
+
+def drop_secondary_indexes(conn, table="books"):
+    rows = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,)
+    ).fetchall()
+    for row in rows:
+        conn.execute(f"DROP INDEX {row['name']}")
+    return [row["sql"] for row in rows]
+
+
+def run_import(csv_path, mode="replace", batch_size=None, progress=None):
+    csv_file = Path(csv_path)
+    if not csv_file.exists():
+        raise FileNotFoundError(f"CSV file not found: {csv_path}")
+    if mode not in IMPORT_MODES:
+        raise ValueError(f"mode must be one of: {', '.join(sorted(IMPORT_MODES))}")
+    batch_size = max(1, batch_size or IMPORT_BATCH_SIZE)
+
+    now = datetime.utcnow().isoformat(timespec="seconds")
+    result = {
+        "mode": mode,
+        "processed": 0,
+        "inserted": 0,
+        "updated": 0,
+        "skipped": 0,
+        "failed": 0,
+        "errors": [],
+        "elapsed": 0.0,
+        "rows_per_sec": 0.0,
+    }
+    rebuild_indexes = mode != "upsert" and csv_file.stat().st_size >= IMPORT_INDEX_REBUILD_BYTES
+    started = time.perf_counter()
+
+    snapshot = auto_snapshot("import")
+    with write_conn() as conn:
+        drop_derived_triggers(conn)
+        table = book_table(conn)
+        if mode == "replace":
+            conn.execute(f"DELETE FROM {table}")
+        index_sql = drop_secondary_indexes(conn, table) if rebuild_indexes else []
+        apply_batch = _upsert_batch if mode == "upsert" else _insert_batch
+        records = apply_record_aliases(iter_csv_records(csv_file, now, result), load_aliases(conn))
+        for batch in iter_batches(records, batch_size):
+            apply_batch(conn, batch, result)
+            result["processed"] += len(batch)
+            elapsed = time.perf_counter() - started
+            result["elapsed"] = round(elapsed, 3)
+            result["rows_per_sec"] = round(result["processed"] / elapsed, 1) if elapsed else 0.0
+            if progress:
+                progress(dict(result))
+        for sql in index_sql:
+            conn.execute(sql)
+        if table == "book_rows":
+            prune_lookups(conn)
+        rebuild_derived(conn)
+
+    elapsed = time.perf_counter() - started
+    result["elapsed"] = round(elapsed, 3)
+    result["rows_per_sec"] = round(result["processed"] / elapsed, 1) if elapsed else 0.0
+    result["imported"] = result["inserted"] + result["updated"]
+    result["snapshot"] = snapshot["id"] if snapshot else None
+    ROW_CACHE.clear()
+    return result
+
+
+def import_csv(csv_path, mode="replace", batch_size=None, progress=None):
+    return run_import(csv_path, mode=mode, batch_size=batch_size, progress=progress)["imported"]
+
+
+IMPORT_JOBS_DB = DB_PATH.parent / "import-jobs.db"
+IMPORT_JOBS_KEEP = 20
+IMPORT_JOB_JSON_FIELDS = {"progress", "result"}
+
+
+@contextmanager
+def import_jobs_conn():
+    conn = sqlite3.connect(IMPORT_JOBS_DB, timeout=DB_BUSY_TIMEOUT / 1000, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS import_jobs (
+                id TEXT PRIMARY KEY,
+                pid INTEGER NOT NULL,
+                csv_path TEXT NOT NULL,
+                mode TEXT NOT NULL,
+                state TEXT NOT NULL,
+                progress TEXT,
+                result TEXT,
+                error TEXT,
+                created_at TEXT NOT NULL,
+                finished_at TEXT
+            )
+            """
+        )
+        yield conn
+    finally:
+        conn.close()
+
+
+def save_import_job(job_id, **changes):
+    changes = {k: json.dumps(v) if k in IMPORT_JOB_JSON_FIELDS and v is not None else v for k, v in changes.items()}
+    with import_jobs_conn() as conn:
+        conn.execute(
+            f"UPDATE import_jobs SET {', '.join(f'{k} = :{k}' for k in changes)} WHERE id = :id",
+            {**changes, "id": job_id},
+        )
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def start_import_job(csv_path, mode, batch_size):
+    job_id = uuid.uuid4().hex[:12]
+    with import_jobs_conn() as conn:
+        conn.execute(
+            """
+            INSERT INTO import_jobs (id, pid, csv_path, mode, state, created_at)
+            VALUES (?, ?, ?, ?, 'queued', ?)
+            """,
+            (job_id, os.getpid(), str(csv_path), mode, datetime.utcnow().isoformat(timespec="seconds")),
+        )
+        conn.execute(
+            """
+            DELETE FROM import_jobs
+            WHERE state IN ('done', 'failed')
+              AND id NOT IN (SELECT id FROM import_jobs ORDER BY created_at DESC, rowid DESC LIMIT ?)
+            """,
+            (IMPORT_JOBS_KEEP,),
+        )
+
+    def work():
+        save_import_job(job_id, state="running")
+        try:
+            result = run_import(
+                csv_path, mode=mode, batch_size=batch_size, progress=lambda p: save_import_job(job_id, progress=p)
+            )
+            changes = {"state": "done", "result": result}
+        except Exception as exc:
+            changes = {"state": "failed", "error": str(exc)}
+        save_import_job(job_id, **changes, finished_at=datetime.utcnow().isoformat(timespec="seconds"))
+
+    threading.Thread(target=work, name=f"import-{job_id}", daemon=True).start()
+    return get_import_job(job_id)
+
+
+def get_import_job(job_id):
+    with import_jobs_conn() as conn:
+        row = conn.execute("SELECT * FROM import_jobs WHERE id = ?", (job_id,)).fetchone()
+    if row is None:
+        return None
+    job = {k: json.loads(row[k]) if k in IMPORT_JOB_JSON_FIELDS and row[k] is not None else row[k] for k in row.keys()}
+    if job["state"] in {"queued", "running"} and not process_alive(job["pid"]):
+        job.update(state="failed", error="import worker exited before the job finished")
+    return job
+
+
+SNAPSHOT_ID_RE = re.compile(r"^\d{8}T\d{6}(\d{6})?Z-[0-9a-f]{6}$")
+SNAPSHOT_LOCK = threading.Lock()
+_last_snapshot_at = None
+
+
+class SnapshotRestarted(Exception):
+    pass
+
+
+def backup_database(src, dest):
+    state = {"remaining": None, "restarts": 0}
+
+    def progress(status, remaining, total):
+        if state["remaining"] is not None and remaining > state["remaining"]:
+            state["restarts"] += 1
+            if state["restarts"] > SNAPSHOT_MAX_RESTARTS:
+                raise SnapshotRestarted()
+        state["remaining"] = remaining
+
+    try:
+        src.backup(dest, pages=SNAPSHOT_STEP_PAGES, progress=progress, sleep=SNAPSHOT_STEP_SLEEP)
+    except SnapshotRestarted:
+        src.backup(dest)
+    return state["restarts"]
+
+
+def snapshot_meta(snap_id):
+    if not SNAPSHOT_ID_RE.match(snap_id or ""):
+        return None
+    try:
+        return json.loads((SNAPSHOT_DIR / f"{snap_id}.json").read_text("utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def list_snapshots():
+    if not SNAPSHOT_DIR.exists():
+        return []
+    items = [item for path in SNAPSHOT_DIR.glob("*.json") if (item := snapshot_meta(path.stem)) is not None]
+    return sorted(items, key=itemgetter("created_at", "id"), reverse=True)
+
+
+def delete_snapshot(snap_id):
+    if snapshot_meta(snap_id) is None:
+        return False
+    (SNAPSHOT_DIR / f"{snap_id}.json").unlink(missing_ok=True)
+    (SNAPSHOT_DIR / f"{snap_id}.db.gz").unlink(missing_ok=True)
+    return True
+
+
+def next_snapshot_time():
+    global _last_snapshot_at
+    now = datetime.utcnow()
+    if _last_snapshot_at is not None and now <= _last_snapshot_at:
+        now = _last_snapshot_at + timedelta(microseconds=1)
+    _last_snapshot_at = now
+    return now
+
+
+def _create_snapshot(reason, label=None, skip_unchanged=False):
+    SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+    created = next_snapshot_time()
+    snap_id = f"{created.strftime('%Y%m%dT%H%M%S%fZ')}-{uuid.uuid4().hex[:6]}"
+    raw = SNAPSHOT_DIR / f"{snap_id}.db.part"
+    packed = SNAPSHOT_DIR / f"{snap_id}.db.gz.part"
+    started = time.perf_counter()
+    src = sqlite3.connect(f"{DB_PATH.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        if skip_unchanged:
+            seq = src.execute("SELECT COALESCE(MAX(seq), 0) FROM book_changes").fetchone()[0]
+            latest = next(iter(list_snapshots()), None)
+            if latest is not None and latest["seq"] == seq:
+                return latest
+        dest = sqlite3.connect(raw)
+        try:
+            restarts = backup_database(src, dest)
+            books = dest.execute("SELECT COUNT(*) FROM books").fetchone()[0]
+            seq = dest.execute("SELECT COALESCE(MAX(seq), 0) FROM book_changes").fetchone()[0]
+            version = dest.execute("PRAGMA user_version").fetchone()[0]
+        finally:
+            dest.close()
+        db_bytes = raw.stat().st_size
+        with raw.open("rb") as f, gzip.open(packed, "wb", compresslevel=SNAPSHOT_GZIP_LEVEL) as out:
+            shutil.copyfileobj(f, out, EXPORT_CHUNK_BYTES)
+        os.replace(packed, SNAPSHOT_DIR / f"{snap_id}.db.gz")
+    finally:
+        src.close()
+        raw.unlink(missing_ok=True)
+        packed.unlink(missing_ok=True)
+    meta = {
+        "id": snap_id,
+        "created_at": created.isoformat(timespec="microseconds"),
+        "reason": reason,
+        "label": label,
+        "books": books,
+        "seq": seq,
+        "schema_version": version,
+        "db_bytes": db_bytes,
+        "bytes": (SNAPSHOT_DIR / f"{snap_id}.db.gz").stat().st_size,
+        "restarts": restarts,
+        "elapsed": round(time.perf_counter() - started, 3),
+    }
+    (SNAPSHOT_DIR / f"{snap_id}.json").write_text(json.dumps(meta), encoding="utf-8")
+    for old in list_snapshots()[SNAPSHOT_KEEP:]:
+        delete_snapshot(old["id"])
+    return meta
+
+
+def create_snapshot(reason, label=None, skip_unchanged=False):
+    with SNAPSHOT_LOCK:
+        return _create_snapshot(reason, label, skip_unchanged)
+
+
+def auto_snapshot(reason):
+    if not SNAPSHOT_AUTO:
+        return None
+    with read_conn() as conn:
+        if not conn.execute("SELECT EXISTS (SELECT 1 FROM books)").fetchone()[0]:
+            return None
+    return create_snapshot(reason, skip_unchanged=True)
+
+
+def restore_snapshot(snap_id):
+    with SNAPSHOT_LOCK:
+        meta = snapshot_meta(snap_id)
+        if meta is None:
+            raise FileNotFoundError(f"Snapshot not found: {snap_id}")
+        staged = DB_PATH.with_name(f"{DB_PATH.name}.restore")
+        try:
+            with gzip.open(SNAPSHOT_DIR / f"{snap_id}.db.gz", "rb") as f, staged.open("wb") as out:
+                shutil.copyfileobj(f, out, EXPORT_CHUNK_BYTES)
+            src = sqlite3.connect(staged)
+            try:
+                if src.execute("PRAGMA quick_check").fetchone()[0] != "ok":
+                    raise ValueError("Snapshot failed integrity check")
+                if src.execute("PRAGMA user_version").fetchone()[0] > SCHEMA_VERSION:
+                    raise ValueError("Snapshot was taken by a newer schema version")
+                safety = _create_snapshot("pre-restore")
+                with POOL.exclusive() as conn:
+                    latest = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM book_changes").fetchone()[0]
+                    src.backup(conn)
+            finally:
+                src.close()
+        except (OSError, EOFError, sqlite3.DatabaseError) as exc:
+            raise ValueError(f"Snapshot could not be restored: {exc}") from None
+        finally:
+            staged.unlink(missing_ok=True)
+    POOL.reset()
+    init_db()
+    with write_conn() as conn:
+        if not conn.execute(
+            "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'book_changes'", (latest,)
+        ).rowcount:
+            conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('book_changes', ?)", (latest,))
+        conn.execute("INSERT INTO book_changes (book_id, op) VALUES (NULL, 'reset')")
+    RESPONSE_CACHE.clear()
+    ROW_CACHE.clear()
+    reset_data_version()
+    bump_generation()
+    return meta, safety
+
+
+EXPORT_FORMATS = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+EXPORT_CSV_COLUMNS = [
+    "Unnamed: 0",
+    "Name",
+    "Author",
+    "Read",
+    "Home?",
+    "Series",
+    "# of Pages",
+    "Language",
+    "Purchase Year",
+    "Non Fiction",
+    "Publisher",
+    "Purchase Location",
+    "Genre",
+    "Subgenre",
+    "Status",
+]
+
+
+def _csv_bool(value):
+    return "" if value is None else str(bool(value))
+
+
+def export_csv_row(index, row):
+    return [
+        index,
+        row["title"],
+        row["author"] or "",
+        str(row["status"] == "Finished"),
+        _csv_bool(row["is_owned"]),
+        _csv_bool(row["is_series"]),
+        "" if row["pages"] is None else row["pages"],
+        row["language"] or "",
+        "" if row["purchase_year"] is None else row["purchase_year"],
+        _csv_bool(row["is_nonfiction"]),
+        row["publisher"] or "",
+        row["purchase_location"] or "",
+        row["genre"] or "",
+        row["subgenre"] or "",
+        row["status"],
+    ]
+
+
+def iter_export_pages(columns, from_sql, where, args, sort_col, order):
+    select = f"SELECT {columns}, {sort_col} AS _sort, books.id AS _id FROM {from_sql}"
+    after = None
+    while True:
+        page_where, page_args = list(where), list(args)
+        if after is not None:
+            predicate, predicate_args = keyset_predicate(sort_col, order, *after)
+            page_where.append(predicate)
+            page_args.extend(predicate_args)
+        where_sql = f"WHERE {' AND '.join(page_where)}" if page_where else ""
+        with read_conn() as conn:
+            rows = conn.execute(
+                f"{select} {where_sql} ORDER BY {sort_col} {order.upper()}, id ASC LIMIT ?",
+                [*page_args, EXPORT_FETCH_SIZE],
+            ).fetchall()
+        if rows:
+            yield rows
+        if len(rows) < EXPORT_FETCH_SIZE:
+            return
+        after = (rows[-1]["_sort"], rows[-1]["_id"])
+
+
+def iter_export_chunks(pages, fmt):
+    import csv
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if fmt == "csv":
+        writer.writerow(EXPORT_CSV_COLUMNS)
+    index = 0
+    for rows in pages:
+        for row in rows:
+            index += 1
+            if fmt == "csv":
+                writer.writerow(export_csv_row(index, row))
+            elif JSON_FAST_PATH:
+                buffer.write(row["_json"])
+                buffer.write("\n")
+            else:
+                buffer.write(json.dumps({k: v for k, v in row_to_dict(row).items() if not k.startswith("_")}))
+                buffer.write("\n")
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+UPDATE_BOOK_SQL = f"""
+    UPDATE books SET {', '.join(f'{col} = :{col}' for col in BOOK_COLUMNS)}, updated_at = :updated_at
+    WHERE id = :id
+"""
+BATCH_OPS = {"create", "update", "delete", "update_where"}
+
+
+def latest_change_seq(conn):
+    return conn.execute("SELECT MAX(seq) FROM book_changes").fetchone()[0]
+
+
+def insert_books(conn, records):
+    if storage_mode(conn) == "normalized":
+        conn.executemany(INSERT_BOOK_SQL, records)
+        last_id = conn.execute("SELECT MAX(id) FROM book_rows").fetchone()[0]
+    elif len(records) == 1:
+        return [conn.execute(INSERT_BOOK_SQL, records[0]).lastrowid]
+    else:
+        conn.executemany(INSERT_BOOK_SQL, records)
+        last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+    return list(range(last_id - len(records) + 1, last_id + 1))
+
+
+def existing_book_ids(conn, ids):
+    found = set()
+    ids = list(ids)
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        placeholders = ", ".join(["?"] * len(chunk))
+        found.update(r[0] for r in conn.execute(f"SELECT id FROM books WHERE id IN ({placeholders})", chunk))
+    return found
+
+
+def validate_batch_op(op):
+    if not isinstance(op, dict):
+        return None, "operation must be an object"
+    kind = op.get("op")
+    if kind not in BATCH_OPS:
+        return None, f"op must be one of: {', '.join(sorted(BATCH_OPS))}"
+    item = {"op": kind}
+    if kind in {"update", "delete"}:
+        try:
+            item["id"] = int(op.get("id"))
+        except (TypeError, ValueError):
+            return None, "Invalid ID"
+    if kind in {"create", "update"}:
+        data = op.get("data")
+        if not isinstance(data, dict):
+            return None, "data must be an object"
+        item["data"] = sanitize_book_payload(data)
+        if not item["data"]["title"]:
+            return None, "title is required"
+    if kind == "update_where":
+        where = op.get("where")
+        changes = op.get("set")
+        if not isinstance(where, dict) or not where:
+            return None, "where must be a non-empty object"
+        if not isinstance(changes, dict) or not changes:
+            return None, "set must be a non-empty object"
+        unknown = sorted((set(where) | set(changes)) - set(BOOK_COLUMNS))
+        if unknown:
+            return None, f"Unknown columns: {', '.join(unknown)}"
+        sanitized = sanitize_book_payload({"title": "-", **changes})
+        item["set"] = {col: sanitized[col] for col in changes}
+        if "title" in item["set"] and not item["set"]["title"]:
+            return None, "title is required"
+        if any(isinstance(v, (dict, list)) for v in where.values()):
+            return None, "where values must be scalars"
+        item["where"] = where
+    return item, None
+
+
+class BatchConflict(Exception):
+    def __init__(self, results):
+        super().__init__("batch rejected")
+        self.results = results
+
+
+def apply_book_batch(conn, items, now, atomic=False):
+    results = {}
+    existing = existing_book_ids(conn, {item["id"] for _, item in items if "id" in item})
+    for kind, group in itertools.groupby(items, key=lambda pair: pair[1]["op"]):
+        group = list(group)
+        if kind == "create":
+            records = [{**item["data"], "created_at": now, "updated_at": now} for _, item in group]
+            for (index, _), new_id in zip(group, insert_books(conn, records)):
+                results[index] = {"index": index, "op": kind, "ok": True, "id": new_id}
+        elif kind in {"update", "delete"}:
+            params = []
+            for index, item in group:
+                if item["id"] in existing:
+                    results[index] = {"index": index, "op": kind, "ok": True, "id": item["id"]}
+                    if kind == "update":
+                        params.append({**item["data"], "updated_at": now, "id": item["id"]})
+                    else:
+                        params.append((item["id"],))
+                        existing.discard(item["id"])
+                else:
+                    results[index] = {"index": index, "op": kind, "ok": False, "id": item["id"], "error": "Book not found"}
+            if params and kind == "update":
+                conn.executemany(UPDATE_BOOK_SQL, params)
+            elif params:
+                conn.executemany("DELETE FROM books WHERE id = ?", params)
+        else:
+            for index, item in group:
+                assignments = ", ".join(f"{col} = ?" for col in item["set"])
+                conditions = " AND ".join(f"{col} IS ?" for col in item["where"])
+                where_args = list(item["where"].values())
+                matched = conn.execute(f"SELECT COUNT(*) FROM books WHERE {conditions}", where_args).fetchone()[0]
+                if matched:
+                    conn.execute(
+                        f"UPDATE books SET {assignments}, updated_at = ? WHERE {conditions}",
+                        [*item["set"].values(), now, *where_args],
+                    )
+                results[index] = {"index": index, "op": kind, "ok": True, "matched": matched}
+    if atomic and not all(r["ok"] for r in results.values()):
+        raise BatchConflict(results)
+    return results
+
+
+STREAMS_STOP = threading.Event()
+SSE_SLOTS = threading.BoundedSemaphore(SSE_MAX_CLIENTS)
+
+
+def sse_event(seq, event, data):
+    return f"id: {seq}\nevent: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+def fetch_change_events(conn, after):
+    changes = conn.execute(
+        "SELECT seq, book_id, op, changed_at FROM book_changes WHERE seq > ? ORDER BY seq LIMIT ?",
+        (after, SSE_BATCH),
+    ).fetchall()
+    ids = list({r["book_id"] for r in changes if r["op"] in ("insert", "update")})
+    books = {}
+    if ids:
+        rows = conn.execute(f"SELECT * FROM books WHERE id IN ({', '.join('?' for _ in ids)})", ids)
+        books = {r["id"]: row_to_dict(r) for r in rows}
+    events = []
+    for r in changes:
+        if r["op"] == "reset":
+            events.append(sse_event(r["seq"], "reset", {"seq": r["seq"], "changed_at": r["changed_at"]}))
+            continue
+        data = {
+            "seq": r["seq"],
+            "op": r["op"],
+            "id": r["book_id"],
+            "book": books.get(r["book_id"]) if r["op"] != "delete" else None,
+            "changed_at": r["changed_at"],
+        }
+        events.append(sse_event(r["seq"], "change", data))
+    return (changes[-1]["seq"] if changes else after), events
+
+
+def iter_change_stream(last_seq):
+    yield f"retry: {int(SSE_POLL_INTERVAL * 1000) + 2500}\n\n".encode("utf-8")
+    with read_conn() as conn:
+        oldest, latest = conn.execute("SELECT MIN(seq), COALESCE(MAX(seq), 0) FROM book_changes").fetchone()
+    if last_seq is None or last_seq > latest:
+        last_seq = latest
+    elif oldest is not None and last_seq < oldest - 1:
+        yield sse_event(latest, "reset", {"seq": latest, "changed_at": None})
+        last_seq = latest
+    generation = None
+    last_write = time.monotonic()
+    while not STREAMS_STOP.is_set():
+        current = current_generation()
+        if current != generation:
+            generation = current
+            batches = []
+            with read_conn() as conn:
+                while True:
+                    last_seq, events = fetch_change_events(conn, last_seq)
+                    if events:
+                        batches.append(b"".join(events))
+                    if len(events) < SSE_BATCH:
+                        break
+            for batch in batches:
+                yield batch
+                last_write = time.monotonic()
+        if time.monotonic() - last_write >= SSE_HEARTBEAT:
+            yield b": ping\n\n"
+            last_write = time.monotonic()
+        STREAMS_STOP.wait(SSE_POLL_INTERVAL)
+
+
+ANALYTICS_DIMENSIONS = [
+    "status",
+    "genre",
+    "subgenre",
+    "language",
+    "author",
+    "publisher",
+    "purchase_year",
+    "format",
+    "source",
+    "rating",
+    "is_owned",
+    "is_nonfiction",
+    "is_series",
+]
+ANALYTICS_INT_DIMENSIONS = {"purchase_year", "rating"}
+ANALYTICS_MAX_GROUP_BY = 3
+ANALYTICS_MAX_LIMIT = 5000
+
+
+class AnalyticsError(ValueError):
+    pass
+
+
+def parse_analytics_value(dim, text):
+    text = text.strip()
+    if text.lower() == "null":
+        return None
+    if dim in ANALYTICS_INT_DIMENSIONS:
+        value = parse_int(text)
+    elif dim in BOOL_COLUMNS:
+        value = parse_bool(text)
+    else:
+        value = text
+    if value is None:
+        raise AnalyticsError(f"Invalid value for {dim}: {text}")
+    return value
+
+
+def parse_analytics_query(params):
+    group_by = [d.strip() for v in params.get("group_by", []) for d in v.split(",") if d.strip()]
+    if not group_by:
+        raise AnalyticsError("group_by is required")
+    if len(group_by) > ANALYTICS_MAX_GROUP_BY or len(set(group_by)) != len(group_by):
+        raise AnalyticsError(f"group_by takes up to {ANALYTICS_MAX_GROUP_BY} distinct dimensions")
+    filters = {}
+    for raw in params.get("filter", []):
+        for clause in raw.split(","):
+            if not clause.strip():
+                continue
+            dim, sep, values = clause.partition(":")
+            dim = dim.strip()
+            if not sep:
+                raise AnalyticsError(f"filter must look like dim:value, got {clause}")
+            if dim not in ANALYTICS_DIMENSIONS:
+                raise AnalyticsError(f"Unknown filter dimension: {dim}")
+            filters.setdefault(dim, set()).update(parse_analytics_value(dim, v) for v in values.split("|"))
+    unknown = [d for d in group_by if d not in ANALYTICS_DIMENSIONS]
+    if unknown:
+        raise AnalyticsError(f"Unknown group_by dimensions: {', '.join(unknown)}")
+    limit = min(ANALYTICS_MAX_LIMIT, max(1, parse_int(params.get("limit", [500])[0]) or 500))
+    return group_by, filters, limit
+
+
+def analytics_group(group_by, key, books, finished, pages_sum, pages_count, rating_sum, rating_count):
+    group = {}
+    for dim, value in zip(group_by, key):
+        group[dim] = bool(value) if dim in BOOL_COLUMNS and value is not None else value
+    group["books"] = books
+    group["finished"] = finished
+    group["avg_pages"] = round(pages_sum / pages_count, 1) if pages_count else None
+    group["avg_rating"] = round(rating_sum / rating_count, 2) if rating_count else None
+    return group
+
+
+def sort_analytics_groups(group_by, groups, limit):
+    def sort_key(group):
+        return (-group["books"], *[(group[d] is not None, group[d]) for d in group_by])
+
+    groups.sort(key=sort_key)
+    return groups[:limit]
+
+
+def sql_analytics(conn, group_by, filters, limit):
+    where = []
+    args = []
+    for dim, values in filters.items():
+        clauses = []
+        present = [v for v in values if v is not None]
+        if present:
+            clauses.append(f"{dim} IN ({', '.join('?' for _ in present)})")
+            args.extend(present)
+        if None in values:
+            clauses.append(f"{dim} IS NULL")
+        where.append(f"({' OR '.join(clauses)})")
+    where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+    dims_sql = ", ".join(group_by)
+    rows = conn.execute(
+        f"""
+        SELECT {dims_sql}, COUNT(*) AS books,
+               SUM(status = 'Finished') AS finished,
+               TOTAL(pages) AS pages_sum, COUNT(pages) AS pages_count,
+               TOTAL(rating) AS rating_sum, COUNT(rating) AS rating_count
+        FROM books
+        {where_sql}
+        GROUP BY {dims_sql}
+        """,
+        args,
+    ).fetchall()
+    groups = [
+        analytics_group(
+            group_by,
+            tuple(r[d] for d in group_by),
+            r["books"],
+            r["finished"],
+            r["pages_sum"],
+            r["pages_count"],
+            r["rating_sum"],
+            r["rating_count"],
+        )
+        for r in rows
+    ]
+    return sum(g["books"] for g in groups), sort_analytics_groups(group_by, groups, limit)
+
+
+class ColumnarBooks:
+    COLUMNS = ["id", *ANALYTICS_DIMENSIONS, "pages"]
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.seq = None
+        self.size = 0
+        self.capacity = 0
+        self.row_of = {}
+        self.values = {}
+        self.lookup = {}
+        self.codes = {}
+        self.pages = None
+        self.rating = None
+        self.finished = None
+        self.alive = None
+        self._stats = {"full_loads": 0, "incremental_refreshes": 0, "rows_refreshed": 0}
+
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        self.codes = {dim: np.zeros(capacity, dtype=np.int32) for dim in ANALYTICS_DIMENSIONS}
+        self.pages = np.full(capacity, np.nan)
+        self.rating = np.full(capacity, np.nan)
+        self.finished = np.zeros(capacity, dtype=np.int8)
+        self.alive = np.zeros(capacity, dtype=bool)
+
+    def _grow(self, needed):
+        capacity = max(needed, self.capacity * 2, 1024)
+        for dim, codes in self.codes.items():
+            self.codes[dim] = np.concatenate([codes, np.zeros(capacity - self.capacity, dtype=np.int32)])
+        self.pages = np.concatenate([self.pages, np.full(capacity - self.capacity, np.nan)])
+        self.rating = np.concatenate([self.rating, np.full(capacity - self.capacity, np.nan)])
+        self.finished = np.concatenate([self.finished, np.zeros(capacity - self.capacity, dtype=np.int8)])
+        self.alive = np.concatenate([self.alive, np.zeros(capacity - self.capacity, dtype=bool)])
+        self.capacity = capacity
+
+    def _encode(self, dim, value):
+        lookup = self.lookup[dim]
+        code = lookup.get(value)
+        if code is None:
+            code = len(self.values[dim])
+            lookup[value] = code
+            self.values[dim].append(value)
+        return code
+
+    def _store(self, pos, row):
+        for dim in ANALYTICS_DIMENSIONS:
+            self.codes[dim][pos] = self._encode(dim, row[dim])
+        self.pages[pos] = np.nan if row["pages"] is None else row["pages"]
+        self.rating[pos] = np.nan if row["rating"] is None else row["rating"]
+        self.finished[pos] = row["status"] == "Finished"
+        self.alive[pos] = True
+
+    def _load(self, conn):
+        rows = conn.execute(f"SELECT {', '.join(self.COLUMNS)} FROM books ORDER BY id").fetchall()
+        n = len(rows)
+        columns = dict(zip(self.COLUMNS, zip(*rows))) if rows else {c: () for c in self.COLUMNS}
+        self.values = {dim: [None] for dim in ANALYTICS_DIMENSIONS}
+        self.lookup = {dim: {None: 0} for dim in ANALYTICS_DIMENSIONS}
+        self.row_of = {book_id: pos for pos, book_id in enumerate(columns["id"])}
+        self._allocate(max(1024, n))
+        for dim in ANALYTICS_DIMENSIONS:
+            for value in dict.fromkeys(columns[dim]):
+                self._encode(dim, value)
+            self.codes[dim][:n] = np.fromiter(map(self.lookup[dim].__getitem__, columns[dim]), dtype=np.int32, count=n)
+        self.pages[:n] = np.array([np.nan if v is None else v for v in columns["pages"]], dtype=float)
+        self.rating[:n] = np.array([np.nan if v is None else v for v in columns["rating"]], dtype=float)
+        self.finished[:n] = np.fromiter((v == "Finished" for v in columns["status"]), dtype=np.int8, count=n)
+        self.alive[:n] = True
+        self.size = n
+        self._stats["full_loads"] += 1
+
+    def _apply(self, conn, book_ids):
+        found = {}
+        ids = list(book_ids)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start : start + 500]
+            sql = f"SELECT {', '.join(self.COLUMNS)} FROM books WHERE id IN ({', '.join('?' for _ in chunk)})"
+            for row in conn.execute(sql, chunk):
+                found[row["id"]] = row
+        for book_id in ids:
+            row = found.get(book_id)
+            pos = self.row_of.get(book_id)
+            if row is None:
+                if pos is not None:
+                    self.alive[pos] = False
+                continue
+            if pos is None:
+                if self.size == self.capacity:
+                    self._grow(self.size + 1)
+                pos = self.size
+                self.size += 1
+                self.row_of[book_id] = pos
+            self._store(pos, row)
+        self._stats["incremental_refreshes"] += 1
+        self._stats["rows_refreshed"] += len(ids)
+
+    def refresh(self, conn):
+        conn.execute("BEGIN")
+        try:
+            oldest, latest = conn.execute("SELECT MIN(seq), MAX(seq) FROM book_changes").fetchone()
+            latest = latest or 0
+            if self.seq is None or (oldest is not None and oldest > self.seq + 1):
+                self._load(conn)
+            elif latest != self.seq:
+                changes = conn.execute(
+                    "SELECT book_id, op FROM book_changes WHERE seq > ? ORDER BY seq", (self.seq,)
+                ).fetchall()
+                book_ids = {r["book_id"] for r in changes}
+                if any(r["op"] == "reset" for r in changes) or len(book_ids) > max(1000, self.size // 4):
+                    self._load(conn)
+                else:
+                    self._apply(conn, book_ids)
+            self.seq = latest
+        finally:
+            conn.execute("COMMIT")
+
+    def query(self, conn, group_by, filters, limit):
+        with self._lock:
+            self.refresh(conn)
+            n = self.size
+            mask = self.alive[:n].copy()
+            for dim, values in filters.items():
+                allowed = [self.lookup[dim][v] for v in values if v in self.lookup[dim]]
+                mask &= np.isin(self.codes[dim][:n], allowed)
+            key = np.zeros(int(mask.sum()), dtype=np.int64)
+            radices = []
+            for dim in group_by:
+                radix = len(self.values[dim])
+                key = key * radix + self.codes[dim][:n][mask]
+                radices.append(radix)
+            uniq, inverse = np.unique(key, return_inverse=True)
+            pages = self.pages[:n][mask]
+            rating = self.rating[:n][mask]
+            has_pages = ~np.isnan(pages)
+            has_rating = ~np.isnan(rating)
+            books = np.bincount(inverse, minlength=len(uniq))
+            finished = np.bincount(inverse, weights=self.finished[:n][mask], minlength=len(uniq))
+            pages_sum = np.bincount(inverse, weights=np.where(has_pages, pages, 0), minlength=len(uniq))
+            pages_count = np.bincount(inverse, weights=has_pages, minlength=len(uniq))
+            rating_sum = np.bincount(inverse, weights=np.where(has_rating, rating, 0), minlength=len(uniq))
+            rating_count = np.bincount(inverse, weights=has_rating, minlength=len(uniq))
+            groups = []
+            for i, combined in enumerate(uniq.tolist()):
+                codes = []
+                for radix in reversed(radices):
+                    combined, code = divmod(combined, radix)
+                    codes.append(code)
+                labels = tuple(self.values[dim][code] for dim, code in zip(group_by, reversed(codes)))
+                groups.append(
+                    analytics_group(
+                        group_by,
+                        labels,
+                        int(books[i]),
+                        int(finished[i]),
+                        float(pages_sum[i]),
+                        int(pages_count[i]),
+                        float(rating_sum[i]),
+                        int(rating_count[i]),
+                    )
+                )
+            return int(mask.sum()), sort_analytics_groups(group_by, groups, limit)
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data["rows"] = int(self.alive[: self.size].sum()) if self.alive is not None else 0
+            data["capacity"] = self.capacity
+            data["seq"] = self.seq
+            data["dictionary_sizes"] = {dim: len(values) for dim, values in self.values.items()}
+        return data
+
+
+ANALYTICS = ColumnarBooks() if np is not None and ANALYTICS_ENGINE != "sql" else None
+
+
+DEDUPE_KINDS = ["author", "publisher", "book"]
+DEDUPE_THRESHOLD = min(1.0, max(0.3, float(os.getenv("BOOKS_DEDUPE_THRESHOLD", "0.6"))))
+DEDUPE_MAX_GROUPS = 1000
+DEDUPE_STOPWORDS = {
+    "author": {"sir", "dr", "mr", "mrs", "ms", "prof"},
+    "publisher": {
+        "yayinlari",
+        "yayinevi",
+        "yayincilik",
+        "yayinlar",
+        "kitap",
+        "kitaplari",
+        "kitapligi",
+        "publishing",
+        "publishers",
+        "press",
+        "books",
+        "ltd",
+        "inc",
+        "co",
+        "group",
+    },
+}
+
+
+COMBINING_MARKS = re.compile("[\u0300-\u036f]")
+
+
+def fold_tokens(text):
+    text = fold_search_text(text).casefold()
+    if not text.isascii():
+        text = COMBINING_MARKS.sub("", unicodedata.normalize("NFKD", text))
+    return re.findall(r"\w+", text)
+
+
+def name_key(kind, value):
+    tokens = fold_tokens(value)
+    kept = [t for t in tokens if t not in DEDUPE_STOPWORDS[kind]] or tokens
+    return " ".join(sorted(kept))
+
+
+def trigrams(key):
+    padded = f" {key} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def similar_pairs(token_sets, threshold):
+    frequency = Counter(t for tokens in token_sets for t in tokens)
+    index = defaultdict(list)
+    for i in sorted(range(len(token_sets)), key=lambda i: len(token_sets[i])):
+        item = token_sets[i]
+        size = len(item)
+        if not size:
+            continue
+        ordered = sorted(item, key=lambda g: (frequency[g], g))
+        candidates = set()
+        for g in ordered[: size - math.ceil(threshold * size) + 1]:
+            candidates.update(index[g])
+            index[g].append(i)
+        minimum = threshold * size
+        for j in candidates:
+            other = token_sets[j]
+            other_size = len(other)
+            if other_size < minimum:
+                continue
+            shared = len(item & other)
+            score = shared / (size + other_size - shared)
+            if score >= threshold:
+                yield j, i, score
+
+
+def group_pairs(count, pairs):
+    parent = list(range(count))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    weakest = {}
+    for i, j, score in pairs:
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[rj] = ri
+        root = find(i)
+        low = min(score, weakest.pop(ri, 1.0), weakest.pop(rj, 1.0))
+        weakest[root] = low
+    groups = defaultdict(list)
+    for i in range(count):
+        groups[find(i)].append(i)
+    return [(members, weakest.get(root, 1.0)) for root, members in groups.items() if len(members) > 1]
+
+
+def dedupe_rows(conn, kind):
+    if kind != "book":
+        return conn.execute("SELECT label, books FROM book_stats WHERE dim = ?", (kind,)).fetchall()
+    return conn.execute(
+        """
+        SELECT id, title,
+               COALESCE((SELECT canonical FROM name_aliases WHERE kind = 'author' AND alias = books.author), author)
+                   AS author
+        FROM books
+        ORDER BY id
+        """
+    ).fetchall()
+
+
+def find_name_duplicates(kind, rows, threshold, limit):
+    values = [(str(r["label"]), r["books"]) for r in rows]
+    keyed = defaultdict(list)
+    for index, (value, _) in enumerate(values):
+        keyed[name_key(kind, value)].append(index)
+    keys = list(keyed)
+    pairs = [(a, b, 1.0) for members in keyed.values() for a, b in zip(members, members[1:])]
+    for i, j, score in similar_pairs([trigrams(key) if key else set() for key in keys], threshold):
+        pairs.append((keyed[keys[i]][0], keyed[keys[j]][0], score))
+    groups = []
+    for members, score in group_pairs(len(values), pairs):
+        items = sorted(
+            ({"value": values[i][0], "books": values[i][1]} for i in members),
+            key=lambda m: (-m["books"], m["value"].isascii(), m["value"]),
+        )
+        groups.append(
+            {
+                "canonical": items[0]["value"],
+                "books": sum(m["books"] for m in items),
+                "score": round(score, 3),
+                "members": items,
+            }
+        )
+    groups.sort(key=lambda g: (-g["score"], -g["books"], g["canonical"]))
+    return len(groups), groups[:limit]
+
+
+def find_book_duplicates(rows, threshold, limit):
+    blocks = {}
+    token_sets = []
+    for row in rows:
+        author = row["author"] or ""
+        block = blocks.get(author)
+        if block is None:
+            block = blocks[author] = name_key("author", author)
+        token_sets.append({(block, word) for word in fold_tokens(row["title"])})
+    groups = []
+    for members, score in group_pairs(len(rows), similar_pairs(token_sets, threshold)):
+        groups.append(
+            {
+                "score": round(score, 3),
+                "members": [{"id": rows[i]["id"], "title": rows[i]["title"], "author": rows[i]["author"]} for i in members],
+            }
+        )
+    groups.sort(key=lambda g: (-g["score"], -len(g["members"]), g["members"][0]["id"]))
+    return len(groups), groups[:limit]
+
+
+def parse_dedupe_query(params):
+    kind = params.get("kind", ["author"])[0].strip().lower()
+    if kind not in DEDUPE_KINDS:
+        raise ValueError(f"kind must be one of: {', '.join(DEDUPE_KINDS)}")
+    raw = params.get("threshold", [""])[0].strip()
+    try:
+        threshold = float(raw) if raw else DEDUPE_THRESHOLD
+    except ValueError:
+        raise ValueError(f"Invalid threshold: {raw}") from None
+    if not 0.3 <= threshold <= 1.0:
+        raise ValueError("threshold must be between 0.3 and 1.0")
+    limit = min(DEDUPE_MAX_GROUPS, max(1, parse_int(params.get("limit", [100])[0]) or 100))
+    return kind, threshold, limit
+
+
+SIMILAR_WEIGHTS = {
+    "author": 3.0,
+    "series_name": 3.0,
+    "subgenre": 2.0,
+    "genre": 1.5,
+    "publisher": 1.0,
+    "language": 0.5,
+    "pages": 0.5,
+}
+SIMILAR_SOURCES = {"author", "series_name", "subgenre", "genre", "publisher"}
+SIMILAR_PAGE_BUCKETS = [100, 200, 300, 400, 550, 750]
+
+
+def similar_feature_value(col, value):
+    if value is None or value == "":
+        return None
+    if col == "pages":
+        return bisect.bisect(SIMILAR_PAGE_BUCKETS, value)
+    if col in ALIAS_KINDS:
+        return name_key(col, value) or None
+    return " ".join(fold_tokens(value)) or None
+
 
-    status = str(payload.get("status", "Not Started")).strip()
-    valid_statuses = {"Not Started", "Reading", "Paused", "Finished", "DNF"}
-    data["status"] = status if status in valid_statuses else "Not Started"
+class SimilarBooks:
+    COLUMNS = ["id", *SIMILAR_WEIGHTS]
 
-    data["is_owned"] = parse_bool(payload.get("is_owned"))
-    data["is_nonfiction"] = parse_bool(payload.get("is_nonfiction"))
-    data["purchase_year"] = parse_int(payload.get("purchase_year"))
-    data["purchase_location"] = str(payload.get("purchase_location", "")).strip() or None
-    data["publisher"] = str(payload.get("publisher", "")).strip() or None
-    data["format"] = str(payload.get("format", "")).strip() or None
-    data["source"] = str(payload.get("source", "")).strip() or None
-    data["rating"] = parse_int(payload.get("rating"))
-    data["notes"] = str(payload.get("notes", "")).strip() or None
-    data["date_added"] = str(payload.get("date_added", "")).strip() or None
-    data["date_started"] = str(payload.get("date_started", "")).strip() or None
-    data["date_finished"] = str(payload.get("date_finished", "")).strip() or None
-    return data
+    def __init__(self, k, candidates):
+        self.k = k
+        self.candidates = candidates
+        self._lock = threading.Lock()
+        self.seq = None
+        self.features = {}
+        self.weights = []
+        self.sources = []
+        self.books = {}
+        self.postings = defaultdict(list)
+        self._wake = threading.Event()
+        self._thread_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stats = {
+            "full_loads": 0,
+            "table_rebuilds": 0,
+            "incremental_refreshes": 0,
+            "books_recomputed": 0,
+            "errors": 0,
+        }
 
+    def _encode(self, col, value):
+        code = self.features.get((col, value))
+        if code is None:
+            code = self.features[(col, value)] = len(self.weights)
+            self.weights.append(SIMILAR_WEIGHTS[col] ** 2)
+            self.sources.append(col in SIMILAR_SOURCES)
+        return code
 
-def row_to_dict(row):
-    item = dict(row)
-    for key in ["is_series", "is_owned", "is_nonfiction"]:
-        if item.get(key) is not None:
-            item[key] = bool(item[key])
-    return item
+    def _vector(self, row):
+        codes = frozenset(
+            self._encode(col, value)
+            for col in SIMILAR_WEIGHTS
+            if (value := similar_feature_value(col, row[col])) is not None
+        )
+        pages = row["pages"] if isinstance(row["pages"], int) else -1
+        return (pages, row["id"]), codes, math.sqrt(sum(self.weights[c] for c in codes))
 
+    def _add(self, row):
+        entry = self.books[row["id"]] = self._vector(row)
+        for code in entry[1]:
+            if self.sources[code]:
+                bisect.insort(self.postings[code], entry[0])
 
-def import_csv(csv_path):
-    csv_file = Path(csv_path)
-    if not csv_file.exists():
-        raise FileNotFoundError(f"CSV file not found: {csv_path}")
+    def _remove(self, book_id):
+        entry = self.books.pop(book_id, None)
+        if entry is None:
+            return
+        for code in entry[1]:
+            if self.sources[code]:
+                postings = self.postings[code]
+                i = bisect.bisect_left(postings, entry[0])
+                if i < len(postings) and postings[i] == entry[0]:
+                    del postings[i]
 
-    with csv_file.open("r", encoding="utf-8-sig", newline="") as f:
-        reader = csv.DictReader(f)
-        rows = list(reader)
+    def _load(self, conn):
+        self.features, self.weights, self.sources, self.books = {}, [], [], {}
+        self.postings = defaultdict(list)
+        for row in conn.execute(f"SELECT {', '.join(self.COLUMNS)} FROM books"):
+            entry = self.books[row["id"]] = self._vector(row)
+            for code in entry[1]:
+                if self.sources[code]:
+                    self.postings[code].append(entry[0])
+        for postings in self.postings.values():
+            postings.sort()
+        self._stats["full_loads"] += 1
 
-    now = datetime.utcnow().isoformat(timespec="seconds")
-    records = []
-    for row in rows:
-        title = str(row.get("Name", "")).strip()
-        if not title:
-            continue
+    def _apply(self, conn, book_ids):
+        found = {}
+        ids = list(book_ids)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start : start + 500]
+            sql = f"SELECT {', '.join(self.COLUMNS)} FROM books WHERE id IN ({', '.join('?' for _ in chunk)})"
+            for row in conn.execute(sql, chunk):
+                found[row["id"]] = row
+        for book_id in ids:
+            self._remove(book_id)
+            if book_id in found:
+                self._add(found[book_id])
 
-        records.append(
-            {
-                "title": title,
-                "author": str(row.get("Author", "")).strip() or None,
-                "series_name": None,
-                "series_number": None,
-                "is_series": parse_bool(row.get("Series")),
-                "pages": parse_int(row.get("# of Pages")),
-                "language": str(row.get("Language", "")).strip() or None,
-                "genre": str(row.get("Genre", "")).strip() or None,
-                "subgenre": str(row.get("Subgenre", "")).strip() or None,
-                "status": normalize_status(row.get("Read")),
-                "is_owned": parse_bool(row.get("Home?")),
-                "is_nonfiction": parse_bool(row.get("Non Fiction")),
-                "purchase_year": parse_int(row.get("Purchase Year")),
-                "purchase_location": str(row.get("Purchase Location", "")).strip() or None,
-                "publisher": str(row.get("Publisher", "")).strip() or None,
-                "format": None,
-                "source": None,
-                "rating": None,
-                "notes": None,
-                "date_added": None,
-                "date_started": None,
-                "date_finished": None,
-                "created_at": now,
-                "updated_at": now,
-            }
+    def _candidates(self, book_id):
+        key, codes, _ = self.books[book_id]
+        half = self.candidates // 2
+        found = set()
+        for postings in sorted((self.postings[c] for c in codes if self.sources[c]), key=len):
+            if len(found) > self.candidates:
+                break
+            if len(postings) > self.candidates:
+                i = bisect.bisect_left(postings, key)
+                postings = postings[max(0, i - half) : i + half + 1]
+            found.update(map(itemgetter(1), postings))
+        found.discard(book_id)
+        return found
+
+    def _scores(self, book_id):
+        _, codes, norm = self.books[book_id]
+        weight = self.weights.__getitem__
+        scored = []
+        for other in self._candidates(book_id):
+            _, other_codes, other_norm = self.books[other]
+            scored.append((-sum(map(weight, codes & other_codes)) / (norm * other_norm), other))
+        return scored
+
+    def _neighbor_rows(self, book_ids):
+        for book_id in book_ids:
+            if book_id not in self.books:
+                continue
+            for rank, (score, other) in enumerate(heapq.nsmallest(self.k, self._scores(book_id))):
+                yield book_id, rank, other, round(-score, 4)
+
+    def _rebuild(self, conn):
+        conn.execute("DELETE FROM book_neighbors")
+        conn.executemany(
+            "INSERT INTO book_neighbors (book_id, rank, neighbor_id, score) VALUES (?, ?, ?, ?)",
+            self._neighbor_rows(sorted(self.books)),
         )
+        self._stats["table_rebuilds"] += 1
+        self._stats["books_recomputed"] += len(self.books)
 
-    with get_conn() as conn:
-        conn.execute("DELETE FROM books")
+    def _refresh_table(self, conn, changed):
+        affected = set(changed)
+        ids = list(changed)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start : start + 500]
+            sql = f"SELECT DISTINCT book_id FROM book_neighbors WHERE neighbor_id IN ({', '.join('?' for _ in chunk)})"
+            affected.update(r[0] for r in conn.execute(sql, chunk))
+        for book_id in ids:
+            if book_id not in self.books:
+                continue
+            for score, other in self._scores(book_id):
+                if other in affected:
+                    continue
+                count, floor = conn.execute(
+                    "SELECT COUNT(*), MIN(score) FROM book_neighbors WHERE book_id = ?", (other,)
+                ).fetchone()
+                if count < self.k or round(-score, 4) > floor:
+                    affected.add(other)
+        affected = sorted(affected)
+        conn.executemany("DELETE FROM book_neighbors WHERE book_id = ?", [(b,) for b in affected])
         conn.executemany(
-            """
-            INSERT INTO books (
-                title, author, series_name, series_number, is_series, pages, language, genre, subgenre,
-                status, is_owned, is_nonfiction, purchase_year, purchase_location, publisher,
-                format, source, rating, notes, date_added, date_started, date_finished,
-                created_at, updated_at
-            )
-            VALUES (
-                :title, :author, :series_name, :series_number, :is_series, :pages, :language, :genre, :subgenre,
-                :status, :is_owned, :is_nonfiction, :purchase_year, :purchase_location, :publisher,
-                :format, :source, :rating, :notes, :date_added, :date_started, :date_finished,
-                :created_at, :updated_at
+            "INSERT INTO book_neighbors (book_id, rank, neighbor_id, score) VALUES (?, ?, ?, ?)",
+            self._neighbor_rows(affected),
+        )
+        self._stats["incremental_refreshes"] += 1
+        self._stats["books_recomputed"] += len(affected)
+
+    def _changes_since(self, conn, seq, oldest, latest):
+        if seq is None or seq > latest or (oldest is not None and oldest > seq + 1):
+            return None
+        changes = conn.execute("SELECT book_id, op FROM book_changes WHERE seq > ?", (seq,)).fetchall()
+        if any(r["op"] == "reset" for r in changes):
+            return None
+        return {r["book_id"] for r in changes}
+
+    def is_built(self, conn):
+        return conn.execute("SELECT 1 FROM book_neighbors_state").fetchone() is not None
+
+    def is_current(self, conn):
+        state = conn.execute("SELECT seq, k FROM book_neighbors_state").fetchone()
+        latest = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM book_changes").fetchone()[0]
+        return state is not None and state["seq"] == latest and state["k"] == self.k
+
+    def refresh(self, conn):
+        with self._lock:
+            oldest, latest = conn.execute("SELECT MIN(seq), MAX(seq) FROM book_changes").fetchone()
+            latest = latest or 0
+            state = conn.execute("SELECT seq, k FROM book_neighbors_state").fetchone()
+            pending = None
+            if state is not None and state["k"] == self.k:
+                pending = self._changes_since(conn, state["seq"], oldest, latest)
+                if state["seq"] == latest:
+                    return
+            changed = self._changes_since(conn, self.seq, oldest, latest)
+            if changed is None or len(changed) > max(1000, len(self.books) // 4):
+                self._load(conn)
+            elif changed:
+                self._apply(conn, changed)
+            self.seq = latest
+            if pending is None or len(pending) > max(100, len(self.books) // 50):
+                self._rebuild(conn)
+            else:
+                self._refresh_table(conn, pending)
+            conn.execute(
+                "INSERT OR REPLACE INTO book_neighbors_state (id, seq, k) VALUES (1, ?, ?)", (latest, self.k)
             )
+
+    def _connect(self):
+        conn = sqlite3.connect(SIMILAR_DB.resolve().as_uri(), uri=True, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT}")
+        conn.execute("ATTACH DATABASE ? AS library", (f"{DB_PATH.resolve().as_uri()}?mode=ro",))
+        return conn
+
+    def _run(self):
+        conn = None
+        while True:
+            self._wake.wait(SIMILAR_REFRESH_INTERVAL)
+            self._wake.clear()
+            try:
+                if conn is None:
+                    conn = self._connect()
+                if self.is_current(conn):
+                    continue
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    self.refresh(conn)
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                conn.execute("COMMIT")
+            except sqlite3.Error as exc:
+                if exc.sqlite_errorcode == sqlite3.SQLITE_BUSY:
+                    continue
+                with self._lock:
+                    self._stats["errors"] += 1
+                print(f"Similar books refresh failed: {exc}")
+                if conn is not None:
+                    conn.close()
+                conn = None
+
+    def start(self):
+        with self._thread_lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._wake = threading.Event()
+                self._wake.set()
+                self._thread = threading.Thread(target=self._run, name="books-similar", daemon=True)
+                self._thread.start()
+
+    def wake(self):
+        if self._pid == os.getpid():
+            self._wake.set()
+
+    def lookup(self, conn, book_id, limit):
+        return conn.execute(
+            """
+            SELECT books.*, n.score AS score FROM book_neighbors n
+            JOIN books ON books.id = n.neighbor_id
+            WHERE n.book_id = ? ORDER BY n.rank LIMIT ?
             """,
-            records,
-        )
+            (book_id, limit),
+        ).fetchall()
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data["books"] = len(self.books)
+            data["features"] = len(self.weights)
+            data["seq"] = self.seq
+            data["k"] = self.k
+        return data
 
-    return len(records)
+
+SIMILAR = SimilarBooks(SIMILAR_K, SIMILAR_CANDIDATES)
 
 
 class AppHandler(SimpleHTTPRequestHandler):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, directory=str(STATIC_DIR), **kwargs)
 
+    _cache_key = None
+    _status = None
+
+    def handle_one_request(self):
+        if not PROFILE_ENABLED:
+            return super().handle_one_request()
+        self.command = None
+        self._status = None
+        start_request_profile()
+        started = time.perf_counter()
+        try:
+            super().handle_one_request()
+        finally:
+            if self.command:
+                total_ms = (time.perf_counter() - started) * 1000
+                finish_request_profile(f"{self.command} {route_label(self.path)}", self._status, total_ms)
+            else:
+                _profile_local.profile = None
+
+    def send_response(self, code, message=None):
+        self._status = int(code)
+        super().send_response(code, message)
+
     def _send_json(self, payload, status=HTTPStatus.OK):
-        body = json.dumps(payload).encode("utf-8")
+        started = time.perf_counter()
+        body = encode_json(payload)
+        profile = _active_profile()
+        if profile is not None:
+            profile["serialize_ms"] += (time.perf_counter() - started) * 1000
+        if status == HTTPStatus.OK and self._cache_key is not None:
+            entry = {
+                "body": body,
+                "etag": make_etag(body),
+                "content_type": "application/json; charset=utf-8",
+                "encoded": {},
+            }
+            RESPONSE_CACHE.put(self._cache_key, entry)
+            return self._send_cache_entry(entry)
+        self._send_bytes(body, "application/json; charset=utf-8", status=status)
+
+    def _send_bytes(self, body, content_type, status=HTTPStatus.OK, headers=(), encoded=None):
+        encoding = None
+        if len(body) >= COMPRESS_MIN_BYTES:
+            encoding = negotiate_encoding(self.headers.get("Accept-Encoding"))
+        if encoding:
+            compressed = encoded.get(encoding) if encoded is not None else None
+            if compressed is None:
+                compressed = compress_body(body, encoding)
+                if encoded is not None:
+                    encoded[encoding] = compressed
+            body = compressed
         self.send_response(status)
-        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Type", content_type)
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        if encoding or len(body) >= COMPRESS_MIN_BYTES:
+            self.send_header("Vary", "Accept-Encoding")
+        for name, value in headers:
+            self.send_header(name, value)
         self.send_header("Content-Length", str(len(body)))
+        started = time.perf_counter()
         self.end_headers()
         self.wfile.write(body)
+        profile = _active_profile()
+        if profile is not None:
+            profile["write_ms"] += (time.perf_counter() - started) * 1000
+
+    def _send_cache_entry(self, entry):
+        encoding = None
+        if len(entry["body"]) >= COMPRESS_MIN_BYTES:
+            encoding = negotiate_encoding(self.headers.get("Accept-Encoding"))
+        etag = variant_etag(entry["etag"], encoding)
+        if etag_matches(self.headers.get("If-None-Match"), etag):
+            RESPONSE_CACHE.note_not_modified()
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            return
+        self._send_bytes(
+            entry["body"],
+            entry["content_type"],
+            headers=[("ETag", etag), ("Cache-Control", "no-cache")],
+            encoded=entry["encoded"],
+        )
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            index = os.path.join(path, "index.html")
+            if not urlparse(self.path).path.endswith("/") or not os.path.isfile(index):
+                return super().send_head()
+            path = index
+        if not os.path.isfile(path):
+            return super().send_head()
+
+        stat = os.stat(path)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        variants = STATIC_VARIANTS.get(path, {})
+        encoding = negotiate_encoding(self.headers.get("Accept-Encoding"), available=variants)
+        variant_path = variants.get(encoding)
+        if variant_path and (not os.path.isfile(variant_path) or os.stat(variant_path).st_mtime < stat.st_mtime):
+            encoding = variant_path = None
+        etag = variant_etag(etag, encoding)
+        cache_control = "no-cache" if path.endswith(".html") else f"public, max-age={STATIC_MAX_AGE}"
+
+        if self._static_not_modified(etag, stat.st_mtime):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", cache_control)
+            self.end_headers()
+            return None
+
+        f = open(variant_path or path, "rb")
+        try:
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", self.guess_type(path))
+            if encoding:
+                self.send_header("Content-Encoding", encoding)
+            if variants:
+                self.send_header("Vary", "Accept-Encoding")
+            self.send_header("Content-Length", str(os.fstat(f.fileno()).st_size))
+            self.send_header("Last-Modified", self.date_time_string(stat.st_mtime))
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", cache_control)
+            self.end_headers()
+            return f
+        except Exception:
+            f.close()
+            raise
+
+    def _static_not_modified(self, etag, mtime):
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match:
+            return etag_matches(if_none_match, etag)
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if not if_modified_since:
+            return False
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError, IndexError, OverflowError):
+            return False
+        return since is not None and int(mtime) <= since.timestamp()
+
+    def copyfile(self, source, outputfile):
+        if isinstance(self.connection, socket.socket):
+            self.wfile.flush()
+            self.connection.sendfile(source)
+            return
+        super().copyfile(source, outputfile)
+
+    def _cached(self, parsed, handler, *args):
+        key = (parsed.path, normalize_query(parsed.query), current_generation())
+        entry = RESPONSE_CACHE.get(key)
+        if entry is not None:
+            return self._send_cache_entry(entry)
+        self._cache_key = key
+        try:
+            return self._dispatch(handler, *args)
+        finally:
+            self._cache_key = None
 
     def _read_json(self):
         length = int(self.headers.get("Content-Length", "0"))
         raw = self.rfile.read(length) if length else b"{}"
         return json.loads(raw.decode("utf-8"))
 
+    def _dispatch(self, handler, *args):
+        try:
+            return handler(*args)
+        except PoolTimeout as exc:
+            return self._send_json({"error": str(exc)}, status=HTTPStatus.SERVICE_UNAVAILABLE)
+
     def do_GET(self):
         parsed = urlparse(self.path)
         if parsed.path == "/api/books":
-            return self.handle_list_books(parsed.query)
+            return self._cached(parsed, self.handle_list_books, parsed.query)
         if parsed.path == "/api/filters":
-            return self.handle_filters()
+            return self._cached(parsed, self.handle_filters)
         if parsed.path == "/api/dashboard":
-            return self.handle_dashboard()
+            return self._cached(parsed, self.handle_dashboard)
+        if parsed.path == "/api/dashboard/check":
+            return self._dispatch(self.handle_dashboard_check)
+        if parsed.path == "/api/analytics":
+            return self._cached(parsed, self.handle_analytics, parsed.query)
+        if parsed.path == "/api/duplicates":
+            return self._cached(parsed, self.handle_duplicates, parsed.query)
+        if parsed.path == "/api/aliases":
+            return self._cached(parsed, self.handle_list_aliases, parsed.query)
+        if parsed.path == "/api/changes":
+            return self._dispatch(self.handle_changes, parsed.query)
+        if parsed.path == "/api/export":
+            return self._dispatch(self.handle_export, parsed.query)
+        if parsed.path == "/api/metrics":
+            return self._dispatch(self.handle_metrics, parsed.query)
+        if parsed.path == "/api/stats":
+            return self._dispatch(self.handle_stats)
+        if parsed.path.startswith("/api/import/"):
+            return self._dispatch(self.handle_import_status, parsed.path.rsplit("/", 1)[-1])
+        if parsed.path == "/api/snapshots":
+            return self._dispatch(self.handle_list_snapshots)
+        if parsed.path.startswith("/api/books/") and parsed.path.endswith("/similar"):
+            return self._cached(parsed, self.handle_similar_books, parsed.path.split("/")[3], parsed.query)
         if parsed.path.startswith("/api/books/"):
-            return self.handle_get_book(parsed.path.rsplit("/", 1)[-1])
+            return self._cached(parsed, self.handle_get_book, parsed.path.rsplit("/", 1)[-1])
         return super().do_GET()
 
     def do_POST(self):
         if self.path == "/api/books":
-            return self.handle_create_book()
+            return self._dispatch(self.handle_create_book)
+        if self.path == "/api/books/batch":
+            return self._dispatch(self.handle_batch_books)
+        if self.path == "/api/dashboard/rebuild":
+            return self._dispatch(self.handle_dashboard_rebuild)
         if self.path == "/api/import":
-            return self.handle_import()
+            return self._dispatch(self.handle_import)
+        if self.path == "/api/aliases":
+            return self._dispatch(self.handle_set_aliases)
+        if self.path == "/api/snapshots":
+            return self._dispatch(self.handle_create_snapshot)
+        if self.path.startswith("/api/snapshots/") and self.path.endswith("/restore"):
+            return self._dispatch(self.handle_restore_snapshot, self.path.split("/")[3])
         self.send_error(HTTPStatus.NOT_FOUND, "Not found")
 
     def do_PUT(self):
         if self.path.startswith("/api/books/"):
-            return self.handle_update_book(self.path.rsplit("/", 1)[-1])
+            return self._dispatch(self.handle_update_book, self.path.rsplit("/", 1)[-1])
         self.send_error(HTTPStatus.NOT_FOUND, "Not found")
 
     def do_DELETE(self):
         if self.path.startswith("/api/books/"):
-            return self.handle_delete_book(self.path.rsplit("/", 1)[-1])
+            return self._dispatch(self.handle_delete_book, self.path.rsplit("/", 1)[-1])
+        parsed = urlparse(self.path)
+        if parsed.path == "/api/aliases":
+            return self._dispatch(self.handle_delete_alias, parsed.query)
+        if parsed.path.startswith("/api/snapshots/"):
+            return self._dispatch(self.handle_delete_snapshot, parsed.path.rsplit("/", 1)[-1])
         self.send_error(HTTPStatus.NOT_FOUND, "Not found")
 
     def handle_list_books(self, query):
-        params = parse_qs(query)
-        search = params.get("search", [""])[0].strip()
-        status = params.get("status", [""])[0].strip()
-        genre = params.get("genre", [""])[0].strip()
-        language = params.get("language", [""])[0].strip()
+        params = parse_qs(query, keep_blank_values=True)
+        filters = parse_book_filters(params)
         sort = params.get("sort", ["title"])[0]
         order = params.get("order", ["asc"])[0].lower()
         page = max(1, parse_int(params.get("page", [1])[0]) or 1)
         page_size = min(200, max(1, parse_int(params.get("page_size", [50])[0]) or 50))
 
-        sort_map = {
-            "title": "title",
-            "author": "author",
-            "status": "status",
-            "genre": "genre",
-            "language": "language",
-            "purchase_year": "purchase_year",
-            "created_at": "created_at",
-        }
+        try:
+            facets = parse_facets(params)
+        except ValueError as exc:
+            return self._send_json({"error": str(exc)}, status=HTTPStatus.BAD_REQUEST)
+
         order_sql = "DESC" if order == "desc" else "ASC"
-        sort_col = sort_map.get(sort, "title")
-
-        where = []
-        args = []
-        if search:
-            where.append("(title LIKE ? OR author LIKE ?)")
-            like = f"%{search}%"
-            args.extend([like, like])
-        if status:
-            where.append("status = ?")
-            args.append(status)
-        if genre:
-            where.append("genre = ?")
-            args.append(genre)
-        if language:
-            where.append("language = ?")
-            args.append(language)
+        sort_col = SORT_MAP.get(sort, "title")
+        from_sql, where, args, fts_query = build_book_filter_sql(filters)
+
+        if "cursor" in params:
+            sort_key = sort if sort in SORT_MAP else "title"
+            return self._list_books_keyset(params, filters, sort_key, order_sql.lower(), page_size, facets)
 
         where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+        order_by = f"{sort_col} {order_sql}, id ASC"
+        if fts_query and sort == "relevance":
+            order_by = "fts.fts_rank ASC, id ASC"
         offset = (page - 1) * page_size
 
-        with get_conn() as conn:
-            total = conn.execute(f"SELECT COUNT(*) FROM books {where_sql}", args).fetchone()[0]
+        with read_conn() as conn:
+            if filters["search"]:
+                rows = conn.execute(
+                    f"""
+                    SELECT {book_select_sql()}, COUNT(*) OVER () AS _total FROM {from_sql}
+                    {where_sql}
+                    ORDER BY {order_by}
+                    LIMIT ? OFFSET ?
+                    """,
+                    [*args, page_size, offset],
+                ).fetchall()
+                total = rows[0]["_total"] if rows else None
+            else:
+                rows = conn.execute(
+                    f"""
+                    SELECT {book_select_sql()} FROM books
+                    {where_sql}
+                    ORDER BY {order_by}
+                    LIMIT ? OFFSET ?
+                    """,
+                    [*args, page_size, offset],
+                ).fetchall()
+                total = None
+            if total is None and len(rows) < page_size and (rows or offset == 0):
+                total = offset + len(rows)
+            if total is None:
+                total = conn.execute(f"SELECT COUNT(*) FROM {from_sql} {where_sql}", args).fetchone()[0]
+            facet_counts = book_facets(conn, filters, facets) if facets else None
+
+        payload = {
+            "items": book_items(rows),
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+        }
+        if facet_counts is not None:
+            payload["facets"] = facet_counts
+        self._send_json(payload)
+
+    def handle_export(self, query):
+        params = parse_qs(query, keep_blank_values=True)
+        fmt = params.get("format", ["csv"])[0].lower()
+        if fmt not in EXPORT_FORMATS:
+            return self._send_json(
+                {"error": f"format must be one of: {', '.join(EXPORT_FORMATS)}"}, status=HTTPStatus.BAD_REQUEST
+            )
+        filters = parse_book_filters(params)
+        from_sql, where, args, fts_query = build_book_filter_sql(filters)
+        sort = params.get("sort", [""])[0]
+        order = "desc" if params.get("order", ["asc"])[0].lower() == "desc" else "asc"
+        sort_col = SORT_MAP.get(sort, "books.id")
+        if sort not in SORT_MAP:
+            order = "asc"
+        if fts_query and sort == "relevance":
+            sort_col, order = "fts.fts_rank", "asc"
+        columns = "books.*" if fmt == "csv" else book_select_sql()
+
+        pages = iter_export_pages(columns, from_sql, where, args, sort_col, order)
+        first = next(pages, [])
+        self._send_stream(
+            iter_export_chunks(itertools.chain([first], pages), fmt),
+            EXPORT_FORMATS[fmt],
+            headers=[("Content-Disposition", f'attachment; filename="books.{fmt}"')],
+        )
+
+    def handle_changes(self, query):
+        params = parse_qs(query)
+        raw = self.headers.get("Last-Event-ID") or params.get("since", [""])[0]
+        last_seq = parse_int(raw.strip())
+        if not SSE_SLOTS.acquire(blocking=False):
+            return self._send_json({"error": "Too many change stream clients"}, status=HTTPStatus.SERVICE_UNAVAILABLE)
+        try:
+            self._send_stream(
+                iter_change_stream(last_seq),
+                "text/event-stream; charset=utf-8",
+                headers=[("X-Accel-Buffering", "no")],
+                compress=False,
+            )
+        except (BrokenPipeError, ConnectionError):
+            self.close_connection = True
+        finally:
+            SSE_SLOTS.release()
+
+    def _send_stream(self, chunks, content_type, headers=(), compress=True):
+        chunked = self.request_version == "HTTP/1.1"
+        encoding = None
+        if compress:
+            encoding = negotiate_encoding(self.headers.get("Accept-Encoding"), available={"gzip"})
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31) if encoding else None
+        if chunked and self.protocol_version != "HTTP/1.1":
+            self.protocol_version = "HTTP/1.1"
+            headers = [*headers, ("Connection", "close")]
+        elif not chunked:
+            self.close_connection = True
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Cache-Control", "no-store")
+        self.send_header("Vary", "Accept-Encoding")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        if chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+
+        def write(data):
+            if not data:
+                return
+            if chunked:
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            else:
+                self.wfile.write(data)
+
+        for chunk in chunks:
+            write(compressor.compress(chunk) if compressor else chunk)
+        if compressor:
+            write(compressor.flush())
+        if chunked:
+            self.wfile.write(b"0\r\n\r\n")
+
+    def handle_analytics(self, query):
+        params = parse_qs(query, keep_blank_values=True)
+        try:
+            group_by, filters, limit = parse_analytics_query(params)
+        except AnalyticsError as exc:
+            return self._send_json({"error": str(exc)}, status=HTTPStatus.BAD_REQUEST)
+        with read_conn() as conn:
+            if ANALYTICS is not None:
+                total, groups = ANALYTICS.query(conn, group_by, filters, limit)
+            else:
+                total, groups = sql_analytics(conn, group_by, filters, limit)
+        self._send_json(
+            {
+                "group_by": group_by,
+                "engine": "numpy" if ANALYTICS is not None else "sql",
+                "total": total,
+                "groups": groups,
+            }
+        )
+
+    def handle_duplicates(self, query):
+        params = parse_qs(query)
+        try:
+            kind, threshold, limit = parse_dedupe_query(params)
+        except ValueError as exc:
+            return self._send_json({"error": str(exc)}, status=HTTPStatus.BAD_REQUEST)
+        with read_conn() as conn:
+            rows = dedupe_rows(conn, kind)
+        if kind == "book":
+            total, groups = find_book_duplicates(rows, threshold, limit)
+        else:
+            total, groups = find_name_duplicates(kind, rows, threshold, limit)
+        self._send_json({"kind": kind, "threshold": threshold, "total_groups": total, "groups": groups})
+
+    def handle_list_aliases(self, query):
+        kind = parse_qs(query).get("kind", [""])[0].strip().lower()
+        if kind and kind not in ALIAS_KINDS:
+            return self._send_json(
+                {"error": f"kind must be one of: {', '.join(ALIAS_KINDS)}"}, status=HTTPStatus.BAD_REQUEST
+            )
+        with read_conn() as conn:
+            rows = conn.execute(
+                """
+                SELECT kind, alias, canonical, created_at FROM name_aliases
+                WHERE ? = '' OR kind = ?
+                ORDER BY kind, canonical, alias
+                """,
+                (kind, kind),
+            ).fetchall()
+        self._send_json({"aliases": [dict(r) for r in rows]})
+
+    def handle_set_aliases(self):
+        payload = self._read_json()
+        kind = str(payload.get("kind", "")).strip().lower()
+        canonical = str(payload.get("canonical") or "").strip()
+        aliases = payload.get("aliases")
+        if kind not in ALIAS_KINDS:
+            return self._send_json(
+                {"error": f"kind must be one of: {', '.join(ALIAS_KINDS)}"}, status=HTTPStatus.BAD_REQUEST
+            )
+        if not canonical:
+            return self._send_json({"error": "canonical is required"}, status=HTTPStatus.BAD_REQUEST)
+        if not isinstance(aliases, list) or not all(isinstance(a, str) and a.strip() for a in aliases):
+            return self._send_json(
+                {"error": "aliases must be a list of non-empty strings"}, status=HTTPStatus.BAD_REQUEST
+            )
+        with write_conn() as conn:
+            canonical, applied = set_aliases(conn, kind, canonical, [a.strip() for a in aliases])
+        self._send_json({"ok": True, "kind": kind, "canonical": canonical, "aliases": applied})
+
+    def handle_delete_alias(self, query):
+        params = parse_qs(query)
+        kind = params.get("kind", [""])[0].strip().lower()
+        alias = params.get("alias", [""])[0].strip()
+        if kind not in ALIAS_KINDS or not alias:
+            return self._send_json({"error": "kind and alias are required"}, status=HTTPStatus.BAD_REQUEST)
+        with write_conn() as conn:
+            removed = remove_alias(conn, kind, alias)
+        if not removed:
+            return self._send_json({"error": "Alias not found"}, status=HTTPStatus.NOT_FOUND)
+        self._send_json({"ok": True})
+
+    def _list_books_keyset(self, params, filters, sort, order, page_size, facets=()):
+        sort_col = SORT_MAP[sort]
+        from_sql, where, args, _ = build_book_filter_sql(filters)
+        seek_where = list(where)
+        seek_args = list(args)
+        token = params["cursor"][0].strip()
+        if token:
+            try:
+                value, last_id = decode_cursor(token, sort, order)
+            except CursorError as exc:
+                return self._send_json({"error": str(exc)}, status=HTTPStatus.BAD_REQUEST)
+            predicate, predicate_args = keyset_predicate(sort_col, order, value, last_id)
+            seek_where.append(predicate)
+            seek_args.extend(predicate_args)
+
+        seek_where_sql = f"WHERE {' AND '.join(seek_where)}" if seek_where else ""
+        total_mode = params.get("total", ["none"])[0].lower()
+        with read_conn() as conn:
             rows = conn.execute(
                 f"""
-                SELECT * FROM books
-                {where_sql}
-                ORDER BY {sort_col} {order_sql}, id ASC
-                LIMIT ? OFFSET ?
+                SELECT {book_select_sql()}, books.{sort_col} AS _sort, books.id AS _id FROM {from_sql}
+                {seek_where_sql}
+                ORDER BY {sort_col} {order.upper()}, id ASC
+                LIMIT ?
                 """,
-                [*args, page_size, offset],
+                [*seek_args, page_size + 1],
             ).fetchall()
+            total = None
+            if total_mode == "exact":
+                where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+                total = conn.execute(f"SELECT COUNT(*) FROM {from_sql} {where_sql}", args).fetchone()[0]
+            elif total_mode == "estimate":
+                total = estimate_book_total(conn, filters)
+            facet_counts = book_facets(conn, filters, facets) if facets else None
+
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        next_cursor = None
+        if has_more:
+            last = rows[-1]
+            next_cursor = encode_cursor(sort, order, last["_sort"], last["_id"])
+
+        payload = {
+            "items": book_items(rows),
+            "next_cursor": next_cursor,
+            "page_size": page_size,
+            "total": total,
+            "total_kind": total_mode if total is not None else None,
+        }
+        if facet_counts is not None:
+            payload["facets"] = facet_counts
+        self._send_json(payload)
+
+    def handle_batch_books(self):
+        payload = self._read_json()
+        operations = payload.get("operations")
+        mode = str(payload.get("mode", "atomic")).strip().lower()
+        if not isinstance(operations, list) or not operations:
+            return self._send_json({"error": "operations must be a non-empty list"}, status=HTTPStatus.BAD_REQUEST)
+        if len(operations) > BATCH_MAX_OPS:
+            return self._send_json(
+                {"error": f"at most {BATCH_MAX_OPS} operations per batch"}, status=HTTPStatus.BAD_REQUEST
+            )
+        if mode not in {"atomic", "partial"}:
+            return self._send_json({"error": "mode must be atomic or partial"}, status=HTTPStatus.BAD_REQUEST)
+
+        items = []
+        results = [None] * len(operations)
+        for index, op in enumerate(operations):
+            item, error = validate_batch_op(op)
+            if error:
+                kind = op.get("op") if isinstance(op, dict) else None
+                results[index] = {"index": index, "op": kind, "ok": False, "error": error}
+            else:
+                items.append((index, item))
+
+        invalid = [r for r in results if r is not None]
+        if invalid and mode == "atomic":
+            return self._send_json(
+                {"ok": False, "applied": 0, "errors": invalid}, status=HTTPStatus.BAD_REQUEST
+            )
+
+        snapshot = auto_snapshot("batch") if len(items) >= SNAPSHOT_BATCH_MIN else None
+        now = datetime.utcnow().isoformat(timespec="seconds")
+        atomic = mode == "atomic"
+        if items:
+            try:
+                outcome = WRITE_QUEUE.submit(lambda conn: apply_book_batch(conn, items, now, atomic))
+            except BatchConflict as exc:
+                errors = [exc.results[index] for index in sorted(exc.results) if not exc.results[index]["ok"]]
+                return self._send_json(
+                    {"ok": False, "applied": 0, "errors": errors}, status=HTTPStatus.CONFLICT
+                )
+            for index, result in outcome.items():
+                results[index] = result
 
+        applied = sum(1 for r in results if r["ok"])
         self._send_json(
             {
-                "items": [row_to_dict(r) for r in rows],
-                "total": total,
-                "page": page,
-                "page_size": page_size,
+                "ok": applied == len(results),
+                "applied": applied,
+                "results": results,
+                "snapshot": snapshot["id"] if snapshot else None,
             }
         )
 
@@ -353,13 +4176,40 @@ class AppHandler(SimpleHTTPRequestHandler):
         except ValueError:
             return self._send_json({"error": "Invalid ID"}, status=HTTPStatus.BAD_REQUEST)
 
-        with get_conn() as conn:
-            row = conn.execute("SELECT * FROM books WHERE id = ?", (bid,)).fetchone()
+        body = ROW_CACHE.get(bid)
+        if body is None:
+            seq = ROW_CACHE.seq
+            with read_conn() as conn:
+                row = conn.execute("SELECT * FROM books WHERE id = ?", (bid,)).fetchone()
+            if row is None:
+                return self._send_json({"error": "Book not found"}, status=HTTPStatus.NOT_FOUND)
+            body = ROW_CACHE.store(bid, seq, row)
 
-        if row is None:
-            return self._send_json({"error": "Book not found"}, status=HTTPStatus.NOT_FOUND)
+        self._send_json(body)
+
+    def handle_similar_books(self, book_id, query):
+        try:
+            bid = int(book_id)
+        except ValueError:
+            return self._send_json({"error": "Invalid ID"}, status=HTTPStatus.BAD_REQUEST)
+        params = parse_qs(query)
+        limit = min(SIMILAR_K, max(1, parse_int(params.get("limit", [SIMILAR_K])[0]) or SIMILAR_K))
+
+        with read_conn() as conn:
+            if conn.execute("SELECT 1 FROM books WHERE id = ?", (bid,)).fetchone() is None:
+                return self._send_json({"error": "Book not found"}, status=HTTPStatus.NOT_FOUND)
+            if not SIMILAR.is_built(conn):
+                SIMILAR.wake()
+                return self._send_json(
+                    {"error": "Similar books are still being built"}, status=HTTPStatus.SERVICE_UNAVAILABLE
+                )
+            stale = not SIMILAR.is_current(conn)
+            if stale:
+                SIMILAR.wake()
+                self._cache_key = None
+            rows = SIMILAR.lookup(conn, bid, limit)
 
-        self._send_json(row_to_dict(row))
+        self._send_json({"id": bid, "stale": stale, "items": [row_to_dict(row) for row in rows]})
 
     def handle_create_book(self):
         payload = self._read_json()
@@ -368,19 +4218,19 @@ class AppHandler(SimpleHTTPRequestHandler):
             return self._send_json({"error": "title is required"}, status=HTTPStatus.BAD_REQUEST)
 
         now = datetime.utcnow().isoformat(timespec="seconds")
-        values = [data[col] for col in BOOK_COLUMNS]
-        with get_conn() as conn:
-            cursor = conn.execute(
-                f"""
-                INSERT INTO books ({', '.join(BOOK_COLUMNS)}, created_at, updated_at)
-                VALUES ({', '.join(['?'] * len(BOOK_COLUMNS))}, ?, ?)
-                """,
-                [*values, now, now],
-            )
-            new_id = cursor.lastrowid
-            row = conn.execute("SELECT * FROM books WHERE id = ?", (new_id,)).fetchone()
 
-        self._send_json(row_to_dict(row), status=HTTPStatus.CREATED)
+        record = {**data, "created_at": now, "updated_at": now}
+
+        def create(conn):
+            if STORAGE_MODE == "normalized":
+                new_id = insert_books(conn, [record])[0]
+                row = conn.execute("SELECT * FROM books WHERE id = ?", (new_id,)).fetchone()
+            else:
+                row = conn.execute(f"{INSERT_BOOK_SQL} RETURNING *", record).fetchall()[0]
+            return row, latest_change_seq(conn)
+
+        row, seq = WRITE_QUEUE.submit(create)
+        self._send_json(ROW_CACHE.store(row["id"], seq, row), status=HTTPStatus.CREATED)
 
     def handle_update_book(self, book_id):
         try:
@@ -397,16 +4247,20 @@ class AppHandler(SimpleHTTPRequestHandler):
         assignments = ", ".join([f"{col} = ?" for col in BOOK_COLUMNS])
         values = [data[col] for col in BOOK_COLUMNS]
 
-        with get_conn() as conn:
-            cur = conn.execute(
-                f"UPDATE books SET {assignments}, updated_at = ? WHERE id = ?",
-                [*values, now, bid],
-            )
-            if cur.rowcount == 0:
-                return self._send_json({"error": "Book not found"}, status=HTTPStatus.NOT_FOUND)
-            row = conn.execute("SELECT * FROM books WHERE id = ?", (bid,)).fetchone()
+        sql = f"UPDATE books SET {assignments}, updated_at = ? WHERE id = ?"
+
+        def update(conn):
+            if STORAGE_MODE == "normalized":
+                conn.execute(sql, [*values, now, bid])
+                row = conn.execute("SELECT * FROM books WHERE id = ?", (bid,)).fetchone()
+            else:
+                row = next(iter(conn.execute(f"{sql} RETURNING *", [*values, now, bid]).fetchall()), None)
+            return row, latest_change_seq(conn) if row is not None else None
 
-        self._send_json(row_to_dict(row))
+        row, seq = WRITE_QUEUE.submit(update)
+        if row is None:
+            return self._send_json({"error": "Book not found"}, status=HTTPStatus.NOT_FOUND)
+        self._send_json(ROW_CACHE.store(bid, seq, row))
 
     def handle_delete_book(self, book_id):
         try:
@@ -414,173 +4268,87 @@ class AppHandler(SimpleHTTPRequestHandler):
         except ValueError:
             return self._send_json({"error": "Invalid ID"}, status=HTTPStatus.BAD_REQUEST)
 
-        with get_conn() as conn:
-            cur = conn.execute("DELETE FROM books WHERE id = ?", (bid,))
-            if cur.rowcount == 0:
-                return self._send_json({"error": "Book not found"}, status=HTTPStatus.NOT_FOUND)
+        def delete(conn):
+            found = conn.execute("SELECT 1 FROM books WHERE id = ?", (bid,)).fetchone()
+            if found:
+                conn.execute("DELETE FROM books WHERE id = ?", (bid,))
+            return found
 
+        found = WRITE_QUEUE.submit(delete)
+        ROW_CACHE.discard(bid)
+        if not found:
+            return self._send_json({"error": "Book not found"}, status=HTTPStatus.NOT_FOUND)
         self._send_json({"ok": True})
 
     def handle_filters(self):
-        with get_conn() as conn:
-            statuses = [r[0] for r in conn.execute("SELECT DISTINCT status FROM books WHERE status IS NOT NULL AND status != '' ORDER BY status")]
-            genres = [r[0] for r in conn.execute("SELECT DISTINCT genre FROM books WHERE genre IS NOT NULL AND genre != '' ORDER BY genre")]
-            languages = [r[0] for r in conn.execute("SELECT DISTINCT language FROM books WHERE language IS NOT NULL AND language != '' ORDER BY language")]
+        options = {"status": [], "genre": [], "language": []}
+        with read_conn() as conn:
+            rows = conn.execute(
+                "SELECT dim, label FROM book_stats WHERE dim IN ('status', 'genre', 'language') ORDER BY dim, label"
+            ).fetchall()
+        for row in rows:
+            options[row["dim"]].append(row["label"])
 
-        self._send_json({"statuses": statuses, "genres": genres, "languages": languages})
+        self._send_json({"statuses": options["status"], "genres": options["genre"], "languages": options["language"]})
 
     def handle_dashboard(self):
-        with get_conn() as conn:
+        with read_conn() as conn:
             totals = conn.execute(
                 """
-                SELECT
-                  COUNT(*) AS total,
-                  SUM(CASE WHEN status = 'Finished' THEN 1 ELSE 0 END) AS finished,
-                  SUM(CASE WHEN status = 'Reading' THEN 1 ELSE 0 END) AS reading,
-                  SUM(CASE WHEN status = 'Paused' THEN 1 ELSE 0 END) AS paused,
-                  SUM(CASE WHEN status = 'Not Started' THEN 1 ELSE 0 END) AS not_started,
-                  SUM(CASE WHEN status = 'DNF' THEN 1 ELSE 0 END) AS dnf,
-                  AVG(CASE WHEN pages IS NOT NULL THEN pages END) AS avg_pages
-                FROM books
+                SELECT books AS total,
+                       CASE WHEN pages_count > 0 THEN CAST(pages_sum AS REAL) / pages_count END AS avg_pages
+                FROM book_stats
+                WHERE dim = 'total'
                 """
             ).fetchone()
-            by_status = conn.execute(
-                """
-                SELECT status AS label, COUNT(*) AS value
-                FROM books
-                WHERE status IS NOT NULL AND status != ''
-                GROUP BY status
-                ORDER BY value DESC, label ASC
-                """
-            ).fetchall()
-            by_genre = conn.execute(
-                """
-                SELECT genre AS label, COUNT(*) AS value
-                FROM books
-                WHERE genre IS NOT NULL AND genre != ''
-                GROUP BY genre
-                ORDER BY value DESC, label ASC
-                LIMIT 12
-                """
-            ).fetchall()
-            top_subgenres = conn.execute(
-                """
-                SELECT subgenre AS label, COUNT(*) AS value
-                FROM books
-                WHERE subgenre IS NOT NULL AND subgenre != ''
-                GROUP BY subgenre
-                ORDER BY value DESC, label ASC
-                LIMIT 12
-                """
-            ).fetchall()
-            by_year = conn.execute(
-                """
-                SELECT purchase_year AS label, COUNT(*) AS value
-                FROM books
-                WHERE purchase_year IS NOT NULL
-                GROUP BY purchase_year
-                ORDER BY purchase_year ASC
-                """
-            ).fetchall()
+            by_status = stats_groups(conn, "status")
+            by_genre = stats_group_items(conn, "genre", limit=12)
+            top_subgenres = stats_group_items(conn, "subgenre", limit=12)
+            by_year = stats_group_items(conn, "purchase_year", order_sql="label ASC")
             completed_by_year = conn.execute(
                 """
-                SELECT purchase_year AS label,
-                       SUM(CASE WHEN status = 'Finished' THEN 1 ELSE 0 END) AS finished,
-                       COUNT(*) AS total
-                FROM books
-                WHERE purchase_year IS NOT NULL
-                GROUP BY purchase_year
-                HAVING total > 0
-                ORDER BY purchase_year ASC
-                """
-            ).fetchall()
-            ownership_split = conn.execute(
-                """
-                SELECT
-                  CASE
-                    WHEN is_owned = 1 THEN 'Owned'
-                    WHEN is_owned = 0 THEN 'Not Owned'
-                    ELSE 'Unknown'
-                  END AS label,
-                  COUNT(*) AS value
-                FROM books
-                GROUP BY label
-                ORDER BY value DESC, label ASC
-                """
-            ).fetchall()
-            nonfiction_split = conn.execute(
-                """
-                SELECT
-                  CASE
-                    WHEN is_nonfiction = 1 THEN 'Nonfiction'
-                    WHEN is_nonfiction = 0 THEN 'Fiction'
-                    ELSE 'Unknown'
-                  END AS label,
-                  COUNT(*) AS value
-                FROM books
-                GROUP BY label
-                ORDER BY value DESC, label ASC
+                SELECT label, finished, books AS total
+                FROM book_stats
+                WHERE dim = 'purchase_year'
+                ORDER BY label ASC
                 """
             ).fetchall()
+            ownership_split = stats_group_items(conn, "ownership")
+            nonfiction_split = stats_group_items(conn, "nonfiction")
             pages_by_status = conn.execute(
                 """
-                SELECT status AS label, ROUND(AVG(pages), 1) AS value
-                FROM books
-                WHERE pages IS NOT NULL AND status IS NOT NULL AND status != ''
-                GROUP BY status
-                ORDER BY value DESC, label ASC
-                """
-            ).fetchall()
-            by_language = conn.execute(
-                """
-                SELECT language AS label, COUNT(*) AS value
-                FROM books
-                WHERE language IS NOT NULL AND language != ''
-                GROUP BY language
-                ORDER BY value DESC, label ASC
-                """
-            ).fetchall()
-            top_authors = conn.execute(
-                """
-                SELECT author AS label, COUNT(*) AS value
-                FROM books
-                WHERE author IS NOT NULL AND author != ''
-                GROUP BY author
-                ORDER BY value DESC, label ASC
-                LIMIT 10
-                """
-            ).fetchall()
-            top_publishers = conn.execute(
-                """
-                SELECT publisher AS label, COUNT(*) AS value
-                FROM books
-                WHERE publisher IS NOT NULL AND publisher != ''
-                GROUP BY publisher
+                SELECT label, ROUND(CAST(pages_sum AS REAL) / pages_count, 1) AS value
+                FROM book_stats
+                WHERE dim = 'status' AND pages_count > 0
                 ORDER BY value DESC, label ASC
-                LIMIT 10
                 """
             ).fetchall()
+            by_language = stats_group_items(conn, "language")
+            top_authors = stats_group_items(conn, "author", limit=10)
+            top_publishers = stats_group_items(conn, "publisher", limit=10)
 
-        total = totals["total"] or 0
-        finished = totals["finished"] or 0
+        status_counts = {r["label"]: r["value"] for r in by_status}
+        total = totals["total"] if totals else 0
+        finished = status_counts.get("Finished", 0)
         read_ratio = round((finished / total) * 100, 2) if total else 0
+        avg_pages = totals["avg_pages"] if totals else None
 
         self._send_json(
             {
                 "kpis": {
                     "total_books": total,
                     "finished_books": finished,
-                    "reading_books": totals["reading"] or 0,
-                    "paused_books": totals["paused"] or 0,
-                    "not_started_books": totals["not_started"] or 0,
-                    "dnf_books": totals["dnf"] or 0,
+                    "reading_books": status_counts.get("Reading", 0),
+                    "paused_books": status_counts.get("Paused", 0),
+                    "not_started_books": status_counts.get("Not Started", 0),
+                    "dnf_books": status_counts.get("DNF", 0),
                     "read_ratio": read_ratio,
-                    "avg_pages": round(totals["avg_pages"] or 0, 1),
+                    "avg_pages": round(avg_pages or 0, 1),
                 },
                 "by_status": [dict(r) for r in by_status],
-                "by_genre": [dict(r) for r in by_genre],
-                "top_subgenres": [dict(r) for r in top_subgenres],
-                "by_year": [dict(r) for r in by_year],
+                "by_genre": by_genre,
+                "top_subgenres": top_subgenres,
+                "by_year": by_year,
                 "completed_by_year": [
                     {
                         "label": r["label"],
@@ -588,12 +4356,54 @@ class AppHandler(SimpleHTTPRequestHandler):
                     }
                     for r in completed_by_year
                 ],
-                "ownership_split": [dict(r) for r in ownership_split],
-                "nonfiction_split": [dict(r) for r in nonfiction_split],
+                "ownership_split": ownership_split,
+                "nonfiction_split": nonfiction_split,
                 "pages_by_status": [dict(r) for r in pages_by_status],
-                "by_language": [dict(r) for r in by_language],
-                "top_authors": [dict(r) for r in top_authors],
-                "top_publishers": [dict(r) for r in top_publishers],
+                "by_language": by_language,
+                "top_authors": top_authors,
+                "top_publishers": top_publishers,
+            }
+        )
+
+    def handle_dashboard_check(self):
+        with read_conn() as conn:
+            mismatches = check_book_stats(conn)
+        self._send_json({"ok": not mismatches, "mismatches": mismatches})
+
+    def handle_dashboard_rebuild(self):
+        with write_conn() as conn:
+            drop_stats_triggers(conn)
+            rebuild_book_stats(conn)
+        self._send_json({"ok": True})
+
+    def handle_metrics(self, query):
+        params = parse_qs(query)
+        fmt = params.get("format", [""])[0].lower()
+        if fmt == "prometheus" or (not fmt and "text/plain" in self.headers.get("Accept", "")):
+            body = (METRICS.prometheus() + WRITE_QUEUE.prometheus()).encode("utf-8")
+            return self._send_bytes(body, "text/plain; version=0.0.4; charset=utf-8")
+        self._send_json(
+            {
+                "enabled": PROFILE_ENABLED,
+                "slow_query_ms": SLOW_QUERY_MS,
+                "slow_query_log": str(SLOW_QUERY_LOG),
+                **METRICS.snapshot(),
+                "pool": POOL.stats(),
+                "write_queue": WRITE_QUEUE.stats(),
+                "response_cache": RESPONSE_CACHE.stats(),
+            }
+        )
+
+    def handle_stats(self):
+        self._send_json(
+            {
+                "pid": os.getpid(),
+                "pool": POOL.stats(),
+                "write_queue": WRITE_QUEUE.stats(),
+                "response_cache": RESPONSE_CACHE.stats(),
+                "row_cache": ROW_CACHE.stats(),
+                "analytics": ANALYTICS.stats() if ANALYTICS is not None else None,
+                "similar": SIMILAR.stats(),
             }
         )
 
@@ -602,22 +4412,382 @@ class AppHandler(SimpleHTTPRequestHandler):
         csv_path = payload.get("csv_path")
         if not csv_path:
             return self._send_json({"error": "csv_path is required"}, status=HTTPStatus.BAD_REQUEST)
+        mode = str(payload.get("mode", "replace")).strip().lower()
+        if mode not in IMPORT_MODES:
+            return self._send_json(
+                {"error": f"mode must be one of: {', '.join(sorted(IMPORT_MODES))}"},
+                status=HTTPStatus.BAD_REQUEST,
+            )
+        batch_size = parse_int(payload.get("batch_size"))
+        if not Path(csv_path).exists():
+            return self._send_json({"error": f"CSV file not found: {csv_path}"}, status=HTTPStatus.BAD_REQUEST)
+        if parse_bool(payload.get("background")):
+            job = start_import_job(csv_path, mode, batch_size)
+            return self._send_json(
+                {"ok": True, "job": job, "status_url": f"/api/import/{job['id']}"},
+                status=HTTPStatus.ACCEPTED,
+            )
         try:
-            imported = import_csv(csv_path)
-            self._send_json({"ok": True, "imported": imported})
+            result = run_import(csv_path, mode=mode, batch_size=batch_size)
+            self._send_json({"ok": True, **result})
         except FileNotFoundError as exc:
             self._send_json({"error": str(exc)}, status=HTTPStatus.BAD_REQUEST)
 
+    def handle_list_snapshots(self):
+        self._send_json({"items": list_snapshots(), "keep": SNAPSHOT_KEEP, "auto": SNAPSHOT_AUTO})
+
+    def handle_create_snapshot(self):
+        payload = self._read_json()
+        label = str(payload.get("label") or "").strip()[:200] or None
+        self._send_json(create_snapshot("manual", label), status=HTTPStatus.CREATED)
+
+    def handle_restore_snapshot(self, snap_id):
+        try:
+            restored, safety = restore_snapshot(snap_id)
+        except FileNotFoundError:
+            return self._send_json({"error": "Snapshot not found"}, status=HTTPStatus.NOT_FOUND)
+        except ValueError as exc:
+            return self._send_json({"error": str(exc)}, status=HTTPStatus.BAD_REQUEST)
+        self._send_json({"ok": True, "restored": restored, "safety_snapshot": safety})
+
+    def handle_delete_snapshot(self, snap_id):
+        with SNAPSHOT_LOCK:
+            deleted = delete_snapshot(snap_id)
+        if not deleted:
+            return self._send_json({"error": "Snapshot not found"}, status=HTTPStatus.NOT_FOUND)
+        self._send_json({"ok": True})
+
+    def handle_import_status(self, job_id):
+        job = get_import_job(job_id)
+        if job is None:
+            return self._send_json({"error": "Import job not found"}, status=HTTPStatus.NOT_FOUND)
+        self._send_json(job)
+
+
+class _LoopWriter:
+    def __init__(self, loop, writer):
+        self.loop = loop
+        self.writer = writer
+
+    async def _write(self, data):
+        self.writer.write(data)
+        await self.writer.drain()
+
+    def write(self, data):
+        data = bytes(data)
+        if data:
+            asyncio.run_coroutine_threadsafe(self._write(data), self.loop).result()
+        return len(data)
+
+    def sendfile(self, source):
+        transport = self.writer.transport
+        asyncio.run_coroutine_threadsafe(self.loop.sendfile(transport, source), self.loop).result()
+
+    def flush(self):
+        pass
+
+
+class AsyncBridgeHandler(AppHandler):
+    protocol_version = "HTTP/1.1"
+
+    def __init__(self, raw_request, out, client_address, server):
+        self._raw_request = raw_request
+        self._out = out
+        super().__init__(None, client_address, server)
+
+    def setup(self):
+        self.connection = None
+        self.rfile = io.BytesIO(self._raw_request)
+        self.wfile = self._out
+
+    def handle(self):
+        self.close_connection = True
+        self.handle_one_request()
+
+    def finish(self):
+        pass
 
-def run(host="127.0.0.1", port=8000):
+    def copyfile(self, source, outputfile):
+        self._out.sendfile(source)
+
+
+class UnsupportedTransferEncoding(ValueError):
+    pass
+
+
+class AsyncAppServer:
+    def __init__(self, host, port, max_concurrency=ASYNC_MAX_CONCURRENCY, db_threads=ASYNC_DB_THREADS):
+        self.host = host
+        self.port = port
+        self.server_address = (host, port)
+        self.executor = ThreadPoolExecutor(max_workers=db_threads, thread_name_prefix="books-db")
+        self.stream_executor = ThreadPoolExecutor(max_workers=SSE_MAX_CLIENTS + 1, thread_name_prefix="books-sse")
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+        self._closing = False
+        self._connections = set()
+        self._in_flight = 0
+
+    async def _read_chunked(self, reader):
+        chunks = []
+        while True:
+            line = await asyncio.wait_for(reader.readuntil(b"\r\n"), timeout=ASYNC_KEEPALIVE_TIMEOUT)
+            size = int(line.split(b";", 1)[0].strip(), 16)
+            if not size:
+                break
+            chunks.append(await reader.readexactly(size))
+            if await reader.readexactly(2) != b"\r\n":
+                raise ValueError("malformed chunk")
+        while await reader.readuntil(b"\r\n") != b"\r\n":
+            pass
+        return b"".join(chunks)
+
+    async def _read_request(self, reader):
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=ASYNC_KEEPALIVE_TIMEOUT)
+        if len(head) > ASYNC_MAX_HEADER_BYTES:
+            raise ValueError("request headers too large")
+        length = 0
+        chunked = False
+        lines = []
+        for line in head[:-4].split(b"\r\n"):
+            name, _, value = line.partition(b":")
+            name = name.strip().lower()
+            if name == b"content-length":
+                length = int(value.strip() or 0)
+                continue
+            if name == b"transfer-encoding":
+                if value.strip().lower() != b"chunked":
+                    raise UnsupportedTransferEncoding(value.strip().decode("latin-1"))
+                chunked = True
+                continue
+            lines.append(line)
+        if chunked:
+            body = await self._read_chunked(reader)
+        else:
+            body = await reader.readexactly(length) if length else b""
+        lines.append(b"Content-Length: %d" % len(body))
+        return b"\r\n".join(lines) + b"\r\n\r\n" + body
+
+    def _run_handler(self, raw_request, out, peer):
+        handler = AsyncBridgeHandler(raw_request, out, peer, self)
+        return handler.close_connection
+
+    async def _handle_connection(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        loop = asyncio.get_running_loop()
+        peer = writer.get_extra_info("peername") or ("", 0)
+        out = _LoopWriter(loop, writer)
+        try:
+            while not self._closing:
+                try:
+                    raw_request = await self._read_request(reader)
+                except UnsupportedTransferEncoding:
+                    writer.write(b"HTTP/1.1 501 Not Implemented\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                    break
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, asyncio.LimitOverrunError, ValueError):
+                    break
+                if raw_request.startswith(b"GET /api/changes"):
+                    close = await loop.run_in_executor(self.stream_executor, self._run_handler, raw_request, out, peer)
+                    break
+                async with self._semaphore:
+                    self._in_flight += 1
+                    try:
+                        close = await loop.run_in_executor(self.executor, self._run_handler, raw_request, out, peer)
+                    finally:
+                        self._in_flight -= 1
+                await writer.drain()
+                if close:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, asyncio.CancelledError):
+                pass
+
+    async def serve(self, sock=None):
+        loop = asyncio.get_running_loop()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        if sock is not None:
+            server = await asyncio.start_server(self._handle_connection, sock=sock, limit=ASYNC_MAX_HEADER_BYTES)
+        else:
+            server = await asyncio.start_server(
+                self._handle_connection, self.host, self.port, limit=ASYNC_MAX_HEADER_BYTES
+            )
+        self.server_address = server.sockets[0].getsockname()[:2]
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+        self._loop = loop
+        self._stop = stop
+        async with server:
+            await stop.wait()
+            self._closing = True
+            STREAMS_STOP.set()
+            server.close()
+            await server.wait_closed()
+            await self._drain()
+        self.executor.shutdown(wait=True)
+        self.stream_executor.shutdown(wait=False)
+
+    async def _drain(self):
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        while self._in_flight and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        for task in list(self._connections):
+            task.cancel()
+        if self._connections:
+            await asyncio.wait(list(self._connections), timeout=1)
+
+    def shutdown(self):
+        self._loop.call_soon_threadsafe(self._stop.set)
+
+
+def prepare_app():
     init_db()
     imported = bootstrap_data()
     if imported:
         print(f"Bootstrapped DB with {imported} books from {PROJECT_ROOT / 'lib_updated.csv'}")
+    precompress_static()
+
+
+def make_listener(host, port, reuse_port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    return sock
+
+
+def serve_socket(sock, mode):
+    SIMILAR.start()
+    if mode == "asyncio":
+        asyncio.run(AsyncAppServer(*sock.getsockname()[:2]).serve(sock=sock))
+        return
+    server = ThreadingHTTPServer(sock.getsockname()[:2], AppHandler, bind_and_activate=False)
+    server.socket.close()
+    server.socket = sock
+    server.server_address = sock.getsockname()[:2]
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+class WorkerSupervisor:
+    def __init__(self, host, port, workers, mode):
+        self.workers = workers
+        self.mode = mode
+        self.reuse_port = hasattr(socket, "SO_REUSEPORT")
+        self.sock = make_listener(host, port, self.reuse_port)
+        if not self.reuse_port:
+            self.sock.listen(socket.SOMAXCONN)
+        self.address = self.sock.getsockname()[:2]
+        self.children = {}
+        self.stopping = False
+
+    def _worker_socket(self):
+        if not self.reuse_port:
+            return self.sock
+        sock = make_listener(*self.address, reuse_port=True)
+        sock.listen(socket.SOMAXCONN)
+        return sock
+
+    def spawn(self, slot):
+        pid = os.fork()
+        if pid:
+            self.children[pid] = (slot, time.monotonic())
+            return
+        code = 0
+        try:
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            serve_socket(self._worker_socket(), self.mode)
+        except BaseException:
+            code = 1
+        finally:
+            os._exit(code)
+
+    def stop(self, *_):
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def serve(self):
+        POOL.reset()
+        reset_data_version()
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        for slot in range(self.workers):
+            self.spawn(slot)
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            slot, started = self.children.pop(pid, (None, 0))
+            if self.stopping or slot is None:
+                continue
+            print(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}; restarting")
+            if time.monotonic() - started < WORKER_RESTART_DELAY:
+                time.sleep(WORKER_RESTART_DELAY)
+            if not self.stopping:
+                self.spawn(slot)
+        self.sock.close()
+
+
+def run(host="127.0.0.1", port=8000, mode=SERVER_MODE, workers=WORKERS):
+    prepare_app()
+    if workers > 1:
+        supervisor = WorkerSupervisor(host, port, workers, mode)
+        print(f"Server running at http://{host}:{supervisor.address[1]} ({mode}, {workers} workers)")
+        supervisor.serve()
+        return
+    SIMILAR.start()
+    if mode == "asyncio":
+        print(f"Server running at http://{host}:{port} (asyncio)")
+        asyncio.run(AsyncAppServer(host, port).serve())
+        return
     server = ThreadingHTTPServer((host, port), AppHandler)
     print(f"Server running at http://{host}:{port}")
     server.serve_forever()
 
 
+def parse_args(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local library tracker server.")
+    parser.add_argument("--host", default=os.getenv("HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument(
+        "--server",
+        choices=["threading", "asyncio"],
+        default=SERVER_MODE if SERVER_MODE in {"threading", "asyncio"} else "threading",
+        help="HTTP server implementation (default from BOOKS_SERVER, else threading)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=WORKERS,
+        help="number of pre-forked worker processes (default from BOOKS_WORKERS, else 1)",
+    )
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
-    run(host=os.getenv("HOST", "127.0.0.1"), port=int(os.getenv("PORT", "8000")))
+    args = parse_args()
+    run(host=args.host, port=args.port, mode=args.server, workers=max(1, args.workers))
@@ -2,6 +2,8 @@ const state = {
   books: [],
   total: 0,
   editingId: null,
+  filterOptions: { statuses: [], genres: [], languages: [] },
+  facets: {},
   filters: {
     search: "",
     status: "",
@@ -125,18 +127,30 @@ function renderBooks() {
   els.tableMeta.textContent = `${state.total} books`;
 }
 
-function renderSelect(el, options, includeAllLabel) {
+function renderSelect(el, options, includeAllLabel, counts) {
   const prev = el.value;
   el.innerHTML = `<option value="">${includeAllLabel}</option>`;
   for (const v of options) {
     const opt = document.createElement("option");
     opt.value = v;
-    opt.textContent = v;
+    opt.textContent = counts ? `${v} (${counts.get(v) || 0})` : v;
     el.appendChild(opt);
   }
   el.value = prev;
 }
 
+function facetCounts(name) {
+  const values = state.facets[name];
+  return values ? new Map(values.map((f) => [f.value, f.count])) : null;
+}
+
+function renderFilters() {
+  const options = state.filterOptions;
+  renderSelect(els.statusFilter, options.statuses, "All statuses", facetCounts("status"));
+  renderSelect(els.genreFilter, options.genres, "All genres", facetCounts("genre"));
+  renderSelect(els.languageFilter, options.languages, "All languages", facetCounts("language"));
+}
+
 function renderKpis(kpis) {
   const data = [
     ["Total", kpis.total_books],
@@ -189,18 +203,25 @@ function escapeHtml(s) {
 }
 
 async function loadBooks() {
-  const query = q({ ...state.filters, page: 1, page_size: 100, sort: "title", order: "asc" });
+  const query = q({
+    ...state.filters,
+    page: 1,
+    page_size: 100,
+    sort: "title",
+    order: "asc",
+    facets: "status,genre,language",
+  });
   const data = await api(`/api/books?${query}`);
   state.books = data.items;
   state.total = data.total;
+  state.facets = data.facets || {};
   renderBooks();
+  renderFilters();
 }
 
 async function loadFilters() {
-  const data = await api("/api/filters");
-  renderSelect(els.statusFilter, data.statuses, "All statuses");
-  renderSelect(els.genreFilter, data.genres, "All genres");
-  renderSelect(els.languageFilter, data.languages, "All languages");
+  state.filterOptions = await api("/api/filters");
+  renderFilters();
 }
 
 async function loadDashboard() {
@@ -221,6 +242,65 @@ async function refreshAll() {
   await Promise.all([loadBooks(), loadFilters(), loadDashboard()]);
 }
 
+let changeFeed = null;
+let summaryTimer = null;
+let listTimer = null;
+
+function debounce(timer, fn) {
+  clearTimeout(timer);
+  return setTimeout(() => fn().catch((err) => (els.tableMeta.textContent = err.message)), 300);
+}
+
+function matchesFilters(book) {
+  const f = state.filters;
+  if (f.status && book.status !== f.status) return false;
+  if (f.genre && book.genre !== f.genre) return false;
+  if (f.language && book.language !== f.language) return false;
+  return true;
+}
+
+function compareBooks(a, b) {
+  if (a.title < b.title) return -1;
+  if (a.title > b.title) return 1;
+  return a.id - b.id;
+}
+
+function applyChange(change) {
+  const idx = state.books.findIndex((b) => b.id === change.id);
+  const unseen = idx === -1 && change.op !== "insert";
+  if (unseen || (change.op !== "delete" && state.filters.search)) {
+    listTimer = debounce(listTimer, loadBooks);
+  } else {
+    if (idx !== -1) {
+      state.books.splice(idx, 1);
+      state.total -= 1;
+    }
+    if (change.book && matchesFilters(change.book)) {
+      state.total += 1;
+      const pos = state.books.findIndex((b) => compareBooks(change.book, b) < 0);
+      if (pos !== -1) state.books.splice(pos, 0, change.book);
+      else if (state.books.length >= state.total - 1) state.books.push(change.book);
+      if (state.books.length > 100) state.books.pop();
+    }
+    renderBooks();
+  }
+  summaryTimer = debounce(summaryTimer, () => Promise.all([loadFilters(), loadDashboard()]));
+}
+
+function connectChanges() {
+  if (!window.EventSource) return;
+  changeFeed = new EventSource("/api/changes");
+  changeFeed.addEventListener("change", (e) => applyChange(JSON.parse(e.data)));
+  changeFeed.addEventListener("reset", () => {
+    refreshAll().catch((err) => (els.tableMeta.textContent = err.message));
+  });
+}
+
+async function afterMutation() {
+  if (changeFeed && changeFeed.readyState === EventSource.OPEN) return;
+  await refreshAll();
+}
+
 els.searchInput.addEventListener("input", async (e) => {
   state.filters.search = e.target.value;
   await loadBooks();
@@ -259,7 +339,7 @@ els.booksTbody.addEventListener("click", async (e) => {
     const ok = window.confirm("Delete this book?");
     if (!ok) return;
     await api(`/api/books/${id}`, { method: "DELETE" });
-    await refreshAll();
+    await afterMutation();
     if (state.editingId === id) resetForm();
   }
 });
@@ -281,7 +361,7 @@ els.form.addEventListener("submit", async (e) => {
   }
 
   resetForm();
-  await refreshAll();
+  await afterMutation();
 });
 
 els.cancelEditBtn.addEventListener("click", resetForm);
@@ -297,7 +377,7 @@ els.importBtn.addEventListener("click", async () => {
     });
     els.importMeta.textContent = `Imported ${res.imported} books.`;
     resetForm();
-    await refreshAll();
+    await afterMutation();
   } catch (err) {
     els.importMeta.textContent = err.message;
   }
@@ -306,3 +386,4 @@ els.importBtn.addEventListener("click", async () => {
 refreshAll().catch((err) => {
   els.tableMeta.textContent = err.message;
 });
+connectChanges();
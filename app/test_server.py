@@ -0,0 +1,384 @@
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from collections import Counter
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import quote, urlencode
+
+TMP_DIR = Path(tempfile.mkdtemp(prefix="books-test-"))
+os.environ["BOOKS_DB"] = str(TMP_DIR / "books.db")
+os.environ["BOOKS_RESPONSE_CACHE_SIZE"] = "0"
+os.environ["BOOKS_ROW_CACHE_BYTES"] = "0"
+os.environ["BOOKS_SNAPSHOT_AUTO"] = "0"
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import server  # noqa: E402
+
+FIXTURE_BOOKS = [
+    {"title": "Unknown Flags", "author": "Nobody", "is_series": None, "is_owned": None, "is_nonfiction": None},
+    {"title": "Half Step", "author": "Ayşe Kulin", "series_name": "Yarım", "series_number": 2.5, "is_series": 1},
+    {"title": "Whole Step", "author": "Ayşe Kulin", "series_name": "Yarım", "series_number": 4.0, "is_series": 1},
+    {"title": 'Quotes "and" \\ slashes', "notes": "line one\nline two\t✓ 📚", "is_owned": 0, "is_nonfiction": 1},
+    {"title": "Zero Pages", "pages": 0, "rating": 0, "is_owned": 1, "is_nonfiction": 0, "purchase_year": 2020},
+]
+
+PARITY_PATHS = [
+    "/api/books",
+    "/api/books?page_size=200&page=2",
+    "/api/books?sort=author&order=desc&page_size=200",
+    "/api/books?sort=purchase_year&order=asc&page_size=200&facets=genre,status",
+    "/api/books?sort=created_at&order=desc&cursor=&page_size=100",
+    "/api/books?search=Step&page_size=200",
+    "/api/books?search=Agatha&sort=relevance",
+    "/api/books?genre=Mystery&facets=status,language",
+    "/api/filters",
+    "/api/dashboard",
+    "/api/analytics?group_by=genre",
+    "/api/duplicates?kind=author",
+]
+
+
+def setUpModule():
+    global HTTPD, BASE_URL
+    server.init_db()
+    server.bootstrap_data()
+    now = "2024-01-01T00:00:00"
+    blank = {col: None for col in server.BOOK_COLUMNS}
+    records = [
+        {**blank, "status": "Not Started", **book, "created_at": now, "updated_at": now} for book in FIXTURE_BOOKS
+    ]
+    with server.write_conn() as conn:
+        server.insert_books(conn, records)
+    HTTPD = ThreadingHTTPServer(("127.0.0.1", 0), server.AppHandler)
+    threading.Thread(target=HTTPD.serve_forever, daemon=True).start()
+    BASE_URL = f"http://127.0.0.1:{HTTPD.server_address[1]}"
+
+
+def tearDownModule():
+    HTTPD.shutdown()
+    HTTPD.server_close()
+    shutil.rmtree(TMP_DIR, ignore_errors=True)
+
+
+def fetch(path, fast):
+    server.JSON_FAST_PATH = fast
+    server.RESPONSE_CACHE.clear()
+    try:
+        with urllib.request.urlopen(BASE_URL + path) as resp:
+            return resp.status, resp.read()
+    finally:
+        server.JSON_FAST_PATH = True
+
+
+def call(method, path, payload=None):
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    request = urllib.request.Request(
+        BASE_URL + path, data=data, method=method, headers={"Content-Type": "application/json"}
+    )
+    server.RESPONSE_CACHE.clear()
+    try:
+        with urllib.request.urlopen(request) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as exc:
+        return exc.code, json.loads(exc.read())
+
+
+def book_ids(sql="SELECT id FROM books ORDER BY id", args=()):
+    with server.read_conn() as conn:
+        return [row[0] for row in conn.execute(sql, args)]
+
+
+def book_titles():
+    with server.read_conn() as conn:
+        return [tuple(row) for row in conn.execute("SELECT id, title FROM books ORDER BY id")]
+
+
+def typed(value):
+    if isinstance(value, tuple):
+        return ("object", [(key, typed(item)) for key, item in value[1]])
+    if isinstance(value, list):
+        return ("array", [typed(item) for item in value])
+    return (type(value).__name__, value)
+
+
+def decode_strict(body):
+    return typed(json.loads(body, object_pairs_hook=lambda pairs: ("object", pairs)))
+
+
+class JsonFastPathParityTest(unittest.TestCase):
+    def assertParity(self, path):
+        slow_status, slow = fetch(path, False)
+        fast_status, fast = fetch(path, True)
+        self.assertEqual(slow_status, fast_status, path)
+        self.assertEqual(decode_strict(slow), decode_strict(fast), path)
+
+    def test_read_endpoints(self):
+        for path in PARITY_PATHS:
+            with self.subTest(path=path):
+                self.assertParity(path)
+
+    def test_single_books(self):
+        titles = [book["title"] for book in FIXTURE_BOOKS]
+        with server.read_conn() as conn:
+            rows = conn.execute(
+                f"SELECT id FROM books WHERE title IN ({', '.join('?' for _ in titles)})", titles
+            ).fetchall()
+        self.assertEqual(len(rows), len(titles))
+        for book_id in [1, *(row["id"] for row in rows)]:
+            with self.subTest(book_id=book_id):
+                self.assertParity(f"/api/books/{book_id}")
+
+    def test_ndjson_export(self):
+        _, slow = fetch("/api/export?format=ndjson", False)
+        _, fast = fetch("/api/export?format=ndjson", True)
+        slow_lines, fast_lines = slow.splitlines(), fast.splitlines()
+        self.assertEqual(len(slow_lines), len(fast_lines))
+        for slow_line, fast_line in zip(slow_lines, fast_lines):
+            self.assertEqual(decode_strict(slow_line), decode_strict(fast_line))
+
+    def test_booleans_stay_booleans(self):
+        _, body = fetch("/api/books?search=Step&page_size=200", True)
+        items = {item["title"]: item for item in json.loads(body)["items"]}
+        self.assertIs(items["Whole Step"]["is_series"], True)
+        self.assertIsNone(items["Half Step"]["is_owned"])
+        self.assertEqual(type(items["Half Step"]["series_number"]), float)
+
+    def test_fast_path_output_is_deterministic(self):
+        for path in PARITY_PATHS[:4]:
+            with self.subTest(path=path):
+                self.assertEqual(fetch(path, True), fetch(path, True))
+
+
+class CsvRoundTripTest(unittest.TestCase):
+    def setUp(self):
+        snapshot = server.create_snapshot("manual", "before csv round trip")
+        self.addCleanup(server.restore_snapshot, snapshot["id"])
+
+    def test_export_import_preserves_null_booleans(self):
+        flags = "SELECT COUNT(*) FROM books WHERE is_owned IS NULL AND is_series IS NULL AND is_nonfiction IS NULL"
+        _, exported = fetch("/api/export?format=csv", True)
+        _, dashboard = fetch("/api/dashboard", True)
+        with server.read_conn() as conn:
+            unknown = conn.execute(flags).fetchone()[0]
+        self.assertGreater(unknown, 0)
+
+        csv_path = TMP_DIR / "roundtrip.csv"
+        csv_path.write_bytes(exported)
+        result = server.run_import(csv_path, mode="replace")
+        self.assertEqual(result["failed"], 0)
+
+        with server.read_conn() as conn:
+            self.assertEqual(conn.execute(flags).fetchone()[0], unknown)
+        self.assertEqual(fetch("/api/export?format=csv", True)[1], exported)
+        self.assertEqual(fetch("/api/dashboard", True)[1], dashboard)
+
+
+class KeysetPaginationTest(unittest.TestCase):
+    def offset_ids(self, query):
+        ids, page = [], 1
+        while True:
+            _, body = call("GET", f"/api/books?{query}&page_size=200&page={page}")
+            ids.extend(item["id"] for item in body["items"])
+            if len(ids) >= body["total"] or not body["items"]:
+                return ids
+            page += 1
+
+    def keyset_ids(self, query):
+        ids, cursor = [], ""
+        while True:
+            _, body = call("GET", f"/api/books?{query}&page_size=97&cursor={quote(cursor)}")
+            ids.extend(item["id"] for item in body["items"])
+            cursor = body["next_cursor"]
+            if cursor is None:
+                return ids
+
+    def test_keyset_matches_offset_for_every_sort(self):
+        for sort in server.SORT_MAP:
+            for order in ("asc", "desc"):
+                for extra in ("", "&genre=Mystery"):
+                    query = f"sort={sort}&order={order}{extra}"
+                    with self.subTest(query=query):
+                        expected = self.offset_ids(query)
+                        self.assertEqual(len(set(expected)), len(expected))
+                        self.assertEqual(self.keyset_ids(query), expected)
+
+    def test_bad_cursor_is_rejected(self):
+        status, _ = call("GET", "/api/books?sort=title&cursor=not-a-cursor")
+        self.assertEqual(status, 400)
+        _, body = call("GET", "/api/books?sort=title&page_size=5&cursor=")
+        status, _ = call("GET", f"/api/books?sort=author&page_size=5&cursor={body['next_cursor']}")
+        self.assertEqual(status, 400)
+
+
+class FacetCountsTest(unittest.TestCase):
+    def brute_force(self, rows, filters):
+        expected = {}
+        for facet in server.FACET_KEYS:
+            counts = Counter(
+                row[facet]
+                for row in rows
+                if row[facet] not in (None, "")
+                and all(str(row[key]) == value for key, value in filters.items() if key != facet)
+            )
+            expected[facet] = sorted(
+                ({"value": value, "count": count} for value, count in counts.items()),
+                key=lambda v: (-v["count"], v["value"]),
+            )
+        return expected
+
+    def test_facets_match_brute_force_counts(self):
+        with server.read_conn() as conn:
+            rows = [dict(row) for row in conn.execute(f"SELECT {', '.join(server.FACET_KEYS)} FROM books")]
+        top = {
+            key: str(Counter(row[key] for row in rows if row[key] not in (None, "")).most_common(1)[0][0])
+            for key in server.FACET_KEYS
+        }
+        cases = [
+            {},
+            {"genre": top["genre"]},
+            {"genre": top["genre"], "status": top["status"]},
+            {"genre": top["genre"], "status": top["status"], "purchase_year": top["purchase_year"]},
+            {"language": "Klingon"},
+        ]
+        for filters in cases:
+            with self.subTest(filters=filters):
+                query = urlencode({**filters, "facets": ",".join(server.FACET_KEYS), "page_size": 1})
+                status, body = call("GET", f"/api/books?{query}")
+                self.assertEqual(status, 200)
+                self.assertEqual(body["facets"], self.brute_force(rows, filters))
+                matching = [r for r in rows if all(str(r[k]) == v for k, v in filters.items())]
+                self.assertEqual(body["total"], len(matching))
+
+
+class BatchMutationTest(unittest.TestCase):
+    def operations(self, title):
+        missing = max(book_ids()) + 1000
+        return [
+            {"op": "create", "data": {"title": title}},
+            {"op": "update", "id": missing, "data": {"title": "Never Written"}},
+        ]
+
+    def test_atomic_batch_rolls_back_on_missing_id(self):
+        before = book_ids()
+        status, body = call("POST", "/api/books/batch", {"operations": self.operations("Atomic Ghost")})
+        self.assertEqual(status, 409)
+        self.assertEqual(body["applied"], 0)
+        self.assertEqual([(e["index"], e["ok"]) for e in body["errors"]], [(1, False)])
+        self.assertEqual(book_ids(), before)
+        self.assertEqual(book_ids("SELECT id FROM books WHERE title = ?", ("Atomic Ghost",)), [])
+
+    def test_partial_batch_keeps_successful_operations(self):
+        status, body = call(
+            "POST", "/api/books/batch", {"mode": "partial", "operations": self.operations("Partial Survivor")}
+        )
+        self.assertEqual(status, 200)
+        self.assertEqual(body["applied"], 1)
+        self.assertEqual([r["ok"] for r in body["results"]], [True, False])
+        created = body["results"][0]["id"]
+        self.assertEqual(book_ids("SELECT id FROM books WHERE title = ?", ("Partial Survivor",)), [created])
+        self.assertEqual(call("DELETE", f"/api/books/{created}")[0], 200)
+
+
+class StorageConversionTest(unittest.TestCase):
+    def setUp(self):
+        self.path = TMP_DIR / "convert.db"
+        self.conn = sqlite3.connect(self.path, isolation_level=None, factory=server.CONNECTION_FACTORY)
+        self.conn.row_factory = sqlite3.Row
+        with server.read_conn() as src:
+            src.backup(self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+        self.path.unlink(missing_ok=True)
+
+    def snapshot(self):
+        rows = [tuple(row) for row in self.conn.execute("SELECT * FROM books ORDER BY id")]
+        sequence = dict(
+            self.conn.execute("SELECT name, seq FROM sqlite_sequence WHERE name IN ('books', 'book_rows')").fetchall()
+        )
+        return rows, sequence
+
+    def convert(self, func):
+        self.conn.execute("BEGIN IMMEDIATE")
+        func(self.conn)
+        self.conn.execute("COMMIT")
+
+    def test_round_trip_preserves_ids_and_sequence(self):
+        self.conn.execute("DELETE FROM books WHERE id = (SELECT MAX(id) FROM books)")
+        rows, sequence = self.snapshot()
+        self.assertGreater(sequence["books"], rows[-1][0])
+
+        self.convert(server.normalize_storage)
+        self.assertEqual(server.storage_mode(self.conn), "normalized")
+        normalized_rows, normalized_sequence = self.snapshot()
+        self.assertEqual(normalized_rows, rows)
+        self.assertEqual(normalized_sequence["book_rows"], sequence["books"])
+        self.assertNotIn("books", normalized_sequence)
+
+        self.convert(server.widen_storage)
+        self.assertEqual(server.storage_mode(self.conn), "wide")
+        self.assertEqual(self.snapshot(), (rows, sequence))
+        new_id = self.conn.execute(
+            "INSERT INTO books (title, created_at, updated_at) VALUES ('After Conversion', '', '') RETURNING id"
+        ).fetchone()[0]
+        self.assertEqual(new_id, sequence["books"] + 1)
+
+
+class RowCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.saved = server.ROW_CACHE
+        server.ROW_CACHE = server.RowCache(1 << 16)
+        self.book_id = book_ids()[0]
+        self.original = call("GET", f"/api/books/{self.book_id}")[1]
+
+    def tearDown(self):
+        server.ROW_CACHE = self.saved
+        with server.write_conn() as conn:
+            conn.execute("UPDATE books SET title = ? WHERE id = ?", (self.original["title"], self.book_id))
+
+    def test_cached_reads_see_writes_from_any_path(self):
+        self.assertEqual(call("GET", f"/api/books/{self.book_id}")[1], self.original)
+        self.assertGreaterEqual(server.ROW_CACHE.stats()["hits"], 1)
+
+        with server.write_conn() as conn:
+            conn.execute("UPDATE books SET title = 'Changed Outside' WHERE id = ?", (self.book_id,))
+        self.assertEqual(call("GET", f"/api/books/{self.book_id}")[1]["title"], "Changed Outside")
+
+        status, echoed = call("PUT", f"/api/books/{self.book_id}", {**self.original, "title": "Changed Here"})
+        self.assertEqual(status, 200)
+        self.assertEqual(call("GET", f"/api/books/{self.book_id}")[1], echoed)
+
+
+class SnapshotRestoreTest(unittest.TestCase):
+    def test_restore_brings_back_rows_and_resets_change_log(self):
+        before = book_titles()
+        status, snapshot = call("POST", "/api/snapshots", {"label": "before edits"})
+        self.assertEqual(status, 201)
+
+        self.assertEqual(call("POST", "/api/books", {"title": "Written After Snapshot"})[0], 201)
+        self.assertEqual(call("DELETE", f"/api/books/{book_ids()[0]}")[0], 200)
+        latest = book_ids("SELECT MAX(seq) FROM book_changes")[0]
+
+        status, body = call("POST", f"/api/snapshots/{snapshot['id']}/restore")
+        self.assertEqual(status, 200)
+        self.assertEqual(book_titles(), before)
+        with server.read_conn() as conn:
+            change = conn.execute("SELECT seq, op FROM book_changes ORDER BY seq DESC LIMIT 1").fetchone()
+        self.assertEqual(change["op"], "reset")
+        self.assertGreater(change["seq"], latest)
+        self.assertEqual(server.list_snapshots()[0]["id"], body["safety_snapshot"]["id"])
+
+    def test_unknown_snapshot_is_not_found(self):
+        self.assertEqual(call("POST", "/api/snapshots/20200101T000000Z-abcdef/restore")[0], 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -224,8 +224,16 @@ export function createBook(payload: Record<string, unknown>) {
     )
   `);
 
-  const info = stmt.run({ ...data, created_at: now, updated_at: now });
-  return getBook(Number(info.lastInsertRowid));
+  // IMMEDIATE holds the write lock from the insert through the id lookup and read-back.
+  const create = db.transaction((row: Record<string, unknown>) => {
+    const info = stmt.run(row);
+    // With BOOKS_STORAGE=normalized, books is a view and INSTEAD OF triggers report no rowid.
+    const id = info.changes
+      ? Number(info.lastInsertRowid)
+      : (db.prepare("SELECT MAX(id) AS id FROM book_rows").get() as { id: number }).id;
+    return getBook(id);
+  });
+  return create.immediate({ ...data, created_at: now, updated_at: now });
 }
 
 export function updateBook(id: number, payload: Record<string, unknown>) {
@@ -244,14 +252,20 @@ export function updateBook(id: number, payload: Record<string, unknown>) {
     WHERE id=@id
   `);
 
-  const result = stmt.run({ ...data, updated_at: now, id });
-  if (result.changes === 0) return null;
-  return getBook(id);
+  const update = db.transaction(() => {
+    stmt.run({ ...data, updated_at: now, id });
+    return getBook(id) ?? null;
+  });
+  return update.immediate();
 }
 
 export function deleteBook(id: number) {
-  const result = db.prepare("DELETE FROM books WHERE id = ?").run(id);
-  return result.changes > 0;
+  const remove = db.transaction(() => {
+    if (!getBook(id)) return false;
+    db.prepare("DELETE FROM books WHERE id = ?").run(id);
+    return true;
+  });
+  return remove.immediate();
 }
 
 export function getFilters() {